@@ -1,8 +1,315 @@
 from __future__ import annotations
 import streamlit as st
+import asyncio
 import requests
-from typing import Protocol, runtime_checkable
+from http.cookiejar import DefaultCookiePolicy
+from requests.cookies import RequestsCookieJar
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from threading import Lock
+from collections import OrderedDict
+from time import monotonic, perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from urllib.parse import unquote
+from typing import Protocol, runtime_checkable, Iterator, Any
 from abc import ABC, abstractmethod
+from dataclasses import fields
+from plclient.api.tracing import record_call
+from plclient.utils.settings import http_pool_size, http_connect_timeout, http_read_timeout, http_retries, \
+    http_backoff_factor, http_fanout_workers, http_batch_size, http_page_size, http_cache_size, \
+    http_cache_ttls, http_cache_invalidates
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTP adapter applying default connect and read
+    timeouts to every request which does not set its own.
+    """
+
+    def __init__(self, *args, timeout: tuple[float, float] | None = None, **kwargs) -> None:
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class ResponseCache:
+    """
+    Least recently used cache of the responses returned by the
+    backend, keyed by url. Each entry expires after the time to
+    live of its resource type, and all the entries of a resource
+    type are dropped whenever a resource of that type, or of a
+    type it depends on, is written.
+    """
+
+    def __init__(self, maxsize: int, ttls: dict[str, float], invalidates: dict[str, tuple[str, ...]]) -> None:
+        self.maxsize = maxsize
+        self.ttls = ttls
+        self.invalidates = invalidates
+        self.entries: OrderedDict[str, tuple[float, str, requests.Response]] = OrderedDict()
+        self.generations: dict[str, int] = {}
+        self.lock = Lock()
+
+    def resource_type(self, url: str) -> str | None:
+        return max((endpoint for endpoint in self.ttls if url.startswith(endpoint)), key=len, default=None)
+
+    def generation(self, resource: str | None) -> int:
+        return self.generations.get(resource, 0)
+
+    def get(self, url: str) -> requests.Response | None:
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            expires_at, resource, response = entry
+            if expires_at <= monotonic():
+                del self.entries[url]
+                return None
+            self.entries.move_to_end(url)
+            return response
+
+    def put(self, url: str, response: requests.Response, generation: int) -> None:
+        resource = self.resource_type(url)
+        if resource is None:
+            return
+        with self.lock:
+            # A write happened while the response was on its way: it may be stale already
+            if generation != self.generation(resource):
+                return
+            self.entries[url] = (monotonic() + self.ttls[resource], resource, response)
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, url: str) -> None:
+        resource = self.resource_type(url)
+        if resource is None:
+            return
+        stale = {resource, *self.invalidates.get(resource, ())}
+        with self.lock:
+            for stale_resource in stale:
+                self.generations[stale_resource] = self.generation(stale_resource) + 1
+            for key in [key for key, (expires_at, cached, response) in self.entries.items() if cached in stale]:
+                del self.entries[key]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+class CachingSession(requests.Session):
+    """
+    HTTP session serving repeated reads of the same url from a
+    response cache, which every other request invalidates.
+    """
+
+    def __init__(self, cache: ResponseCache) -> None:
+        super().__init__()
+        self.cache = cache
+        # Shared by every user session: cookies are kept by each of them instead
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    def request(self, method, url, *args, **kwargs):
+        started = perf_counter()
+        traced_url = url
+        response = None
+        cached = False
+        cookies = _cookies.get()
+        if cookies is not None:
+            kwargs['cookies'] = cookies
+        try:
+            if method.upper() != 'GET':
+                try:
+                    response = super().request(method, url, *args, **kwargs)
+                    return response
+                finally:
+                    self.cache.invalidate(url)
+                    forget(url)
+            traced_url = key = requests.Request(method, url, params=kwargs.get('params')).prepare().url
+            response = self.cache.get(key)
+            if response is not None:
+                cached = True
+                return response
+            generation = self.cache.generation(self.cache.resource_type(key))
+            response = super().request(method, url, *args, **kwargs)
+            if response.status_code == 200:
+                self.cache.put(key, response, generation)
+            return response
+        finally:
+            if cookies is not None and response is not None and not cached:
+                cookies.update(response.cookies)
+            record_call(method.upper(), traced_url, response, perf_counter() - started, cached)
+
+
+_session: requests.Session | None = None
+_session_lock = Lock()
+# Background threads reading ahead the pages which are likely to be asked for next
+_read_ahead = ThreadPoolExecutor(max_workers=2)
+# Threads making the requests awaited by the asynchronous clients, no more than the pooled connections
+_awaited = ThreadPoolExecutor(max_workers=min(http_fanout_workers, http_pool_size), thread_name_prefix='aget')
+
+
+def build_session() -> requests.Session:
+    """
+    Builds an HTTP session keeping connections to the backend
+    alive in a pool, retrying idempotent requests with backoff
+    when the backend is unreachable or temporarily unavailable,
+    and caching the responses to repeated reads.
+    """
+    retry = Retry(
+        total=http_retries,
+        backoff_factor=http_backoff_factor,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(
+        pool_connections=http_pool_size,
+        pool_maxsize=http_pool_size,
+        max_retries=retry,
+        timeout=(http_connect_timeout, http_read_timeout),
+    )
+    session = CachingSession(ResponseCache(http_cache_size, http_cache_ttls, http_cache_invalidates))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the HTTP session shared by every API client of this process.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+# Resources already fetched during the current render, keyed by url
+_identity_map: ContextVar[dict[str, 'APIClientDetail'] | None] = ContextVar('identity_map', default=None)
+# Cookies of the user session the current render is made for
+_cookies: ContextVar[RequestsCookieJar | None] = ContextVar('cookies', default=None)
+
+
+def session_cookies() -> RequestsCookieJar:
+    """
+    Returns the cookies the backend set for the current user session,
+    such as the one pinning to the primary database a user who wrote.
+    """
+    if 'api_cookies' not in st.session_state:
+        st.session_state['api_cookies'] = RequestsCookieJar()
+    return st.session_state['api_cookies']
+
+
+@contextmanager
+def render_scope(cookies: RequestsCookieJar | None = None):
+    """
+    Delimits the render of a page: within it each resource is
+    fetched at most once, any later request for the same url
+    being answered with the instance fetched the first time.
+    Requests send, and keep, the given cookies of the user session
+    the page is rendered for, and no others.
+    """
+    token = _identity_map.set({})
+    cookies_token = _cookies.set(cookies)
+    try:
+        yield
+    finally:
+        _cookies.reset(cookies_token)
+        _identity_map.reset(token)
+
+
+def remember(url: str, detail: APIClientDetail) -> None:
+    identity_map = _identity_map.get()
+    if identity_map is not None and detail.error is None:
+        identity_map[url] = detail
+
+
+def forget(url: str) -> None:
+    identity_map = _identity_map.get()
+    if identity_map is not None:
+        identity_map.pop(url, None)
+
+
+def fetch_batch(datainstance: type['APIClientDetail'], api_endpoint: str, urls: list) -> dict[str, 'APIClientDetail']:
+    """
+    Fetches the resources located by the given urls with as few
+    requests as possible, filtering their collection by primary key.
+    Returns the fetched resources keyed by url; those which could
+    not be fetched this way are left out.
+    """
+    collection = datainstance().api_endpoint
+    urls_by_pk = {
+        unquote(url[len(collection):].strip('/')): url
+        for url in urls if url and url.startswith(collection) and '/' not in url[len(collection):].strip('/')
+    }
+    pks = list(urls_by_pk)
+    fetched = {}
+    for start in range(0, len(pks), http_batch_size):
+        batch = pks[start:start + http_batch_size]
+        response = get_session().get(collection, params={'pk': batch, 'page_size': len(batch)})
+        if not response.ok:
+            break
+        result = response.json()
+        for element in result.get('results', []) if isinstance(result, dict) else []:
+            url = urls_by_pk.get(unquote(element.get('url', '')[len(collection):].strip('/')))
+            if url is not None:
+                fetched[url] = datainstance.from_json(element, api_endpoint=api_endpoint)
+    return fetched
+
+
+def resolve_details(datainstance: type['APIClientDetail'], api_endpoint: str, urls: list) -> list['APIClientDetail']:
+    """
+    Fetches the resources located by the given urls and returns them
+    in the same order as the urls. Resources already fetched during
+    the current render are reused, the others are fetched in batches
+    by primary key and, failing that, concurrently one by one through
+    a bounded pool of threads. A failed request does not affect the
+    others, its error is reported by the corresponding returned instance.
+    """
+    def resolve(url: str) -> APIClientDetail:
+        try:
+            return datainstance(api_endpoint=api_endpoint, url=url).get()
+        except requests.RequestException as ex:
+            return datainstance(api_endpoint=api_endpoint, url=url, error=str(ex))
+
+    resolved = dict(_identity_map.get() or {})
+    missing = [url for url in dict.fromkeys(urls) if url not in resolved]
+    if len(missing) > 1:
+        resolved.update(fetch_batch(datainstance, api_endpoint, missing))
+        missing = [url for url in missing if url not in resolved]
+    if len(missing) <= 1:
+        resolved.update((url, resolve(url)) for url in missing)
+    else:
+        with ThreadPoolExecutor(max_workers=min(http_fanout_workers, len(missing))) as executor:
+            # Worker threads make their requests on behalf of the current render
+            contexts = [copy_context() for url in missing]
+            details = executor.map(lambda context, url: context.run(resolve, url), contexts, missing)
+            resolved.update(zip(missing, details))
+    for url in urls:
+        remember(url, resolved[url])
+    return [resolved[url] for url in urls]
+
+
+def fetch_page(url: str, params: dict | None = None) -> tuple[list, str | None]:
+    """
+    Fetches a page of a collection, returning its elements
+    along with the url of the following page, if any.
+    Collections which are not paginated make up a single page.
+    """
+    response = get_session().get(url, params=params)
+    response.raise_for_status()
+    result = response.json()
+    if isinstance(result, dict) and 'results' in result:
+        return result['results'], result.get('next')
+    return result, None
 
 
 @runtime_checkable
@@ -20,6 +327,48 @@ class APIClient(Protocol):
         ...
 
 
+async def run_blocking(function, *args) -> Any:
+    """
+    Awaits a blocking request made by the given function on one of
+    the threads shared by every asynchronous client of this process.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_awaited, copy_context().run, function, *args)
+
+
+@runtime_checkable
+class AsyncAPIClient(Protocol):
+    """
+    Asynchronous counterpart of APIClient, whose resources
+    can be awaited together with the ones of other clients.
+
+    Requests are still made by the shared requests session, on a
+    bounded pool of threads, rather than by an asynchronous HTTP
+    client: Streamlit renders pages synchronously, so that each
+    fetch_all runs an event loop of its own, which could not keep
+    the connections of an asynchronous client alive from one render
+    to the next. Through the shared session, awaited requests reuse
+    its pooled connections, retries, response cache and tracing,
+    and never outnumber the connections of the pool.
+    """
+    api_endpoint: str
+    error: str | None
+
+    async def aget(self):
+        ...
+
+
+def fetch_all(*clients: AsyncAPIClient) -> list[Any]:
+    """
+    Fetches the resources of the given clients concurrently,
+    returning them in the same order as the clients, so that
+    independent fetches take as long as the slowest of them.
+    """
+    async def gather() -> list[Any]:
+        return list(await asyncio.gather(*(client.aget() for client in clients)))
+
+    return asyncio.run(gather())
+
+
 class APIClientList(ABC):
     """
     Abstract class representing a particular type of APIClient 
@@ -32,15 +381,67 @@ class APIClientList(ABC):
     error: str | None = None
     data: list | None = None
     datainstance: type['APIClientDetail'] | None = None
+    params: dict | None = None
+    limit: int | None = None
 
     def get(self):
         if self.data is not None and self.datainstance is not None:
-            return list(
-                map(lambda x: self.datainstance(api_endpoint=self.api_endpoint, url=x).get().as_dict(), self.data))
+            return [detail.as_dict() for detail in resolve_details(self.datainstance, self.api_endpoint, self.data)]
         if self.data is not None:
             return self.data
-        result = requests.get(self.api_endpoint).json()
-        return result if 'results' not in result else result['results']
+        return [element for page in self.iter_pages() for element in page]
+
+    async def aget(self):
+        return await run_blocking(self.get)
+
+    def get_page(self, page: int, page_size: int) -> tuple[list, int]:
+        """
+        Fetches a single page of the collection, returning its elements
+        along with the size of the whole collection. The following page
+        is read ahead in background, so that it is already in the
+        response cache when asked for.
+        """
+        if self.data is not None:
+            data = self.get()
+            return data[(page - 1) * page_size:page * page_size], len(data)
+        params = {**(self.params or {}), 'page': page, 'page_size': page_size}
+        response = get_session().get(self.api_endpoint, params=params)
+        response.raise_for_status()
+        result = response.json()
+        if not isinstance(result, dict) or 'results' not in result:
+            return result[(page - 1) * page_size:page * page_size], len(result)
+        if result.get('next'):
+            _read_ahead.submit(copy_context().run, get_session().get, self.api_endpoint,
+                               params={**params, 'page': page + 1})
+        return result['results'], result['count']
+
+    def iter_pages(self, limit: int | None = None) -> Iterator[list]:
+        """
+        Lazily iterates over the pages of the collection, following
+        the next links returned by the backend. While a page is being
+        consumed the following one is already fetched in background.
+        Iteration stops after limit elements, when a limit is given
+        here or on the list itself. Pages are as large as the backend
+        allows, or as the limit, and the next links keep their size.
+        """
+        limit = self.limit if limit is None else limit
+        if self.data is not None:
+            yield self.get()[:limit]
+            return
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            page_size = http_page_size if not limit else min(limit, http_page_size)
+            params = {**(self.params or {}), 'page_size': page_size}
+            pending = executor.submit(copy_context().run, fetch_page, self.api_endpoint, params)
+            while pending is not None:
+                elements, next_url = pending.result()
+                if limit is not None:
+                    elements = elements[:limit]
+                    limit -= len(elements)
+                pending = executor.submit(copy_context().run, fetch_page, next_url) if next_url and limit != 0 else None
+                yield elements
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
 
 class APIClientDetail(ABC):
@@ -53,21 +454,40 @@ class APIClientDetail(ABC):
     error: str | None = None
     url: str | None = None
 
+    @classmethod
+    def from_json(cls, element: dict, api_endpoint: str) -> APIClientDetail:
+        """
+        Builds an instance out of a resource returned by the backend,
+        leaving out the fields this client does not know of, so that
+        the backend can expose new ones without breaking it.
+        """
+        known = {detail_field.name for detail_field in fields(cls)}
+        return cls(api_endpoint=api_endpoint, error=None,
+                   **{key: value for key, value in element.items() if key in known})
+
     def get(self) -> APIClientDetail:
+        identity_map = _identity_map.get()
+        if identity_map is not None and self.url in identity_map:
+            return identity_map[self.url]
         try:
             if not self.url:
                 return type(self)(self.api_endpoint, error='No resource to obtain')
-            response = requests.get(self.url)
+            response = get_session().get(self.url)
             response.raise_for_status()
-            return type(self)(self.api_endpoint, error=None, **response.json())
+            detail = type(self).from_json(response.json(), api_endpoint=self.api_endpoint)
+            remember(self.url, detail)
+            return detail
         except requests.HTTPError as ex:
             return type(self)(api_endpoint=self.api_endpoint, error=str(ex))
 
+    async def aget(self) -> APIClientDetail:
+        return await run_blocking(self.get)
+
     def delete(self) -> None:
         try:
             if not self.url:
                 return st.error('No resource to delete')
-            response = requests.delete(self.url)
+            response = get_session().delete(self.url)
             response.raise_for_status()
             st.success('Element correctly deleted')
         except requests.HTTPError as ex:
@@ -1,7 +1,7 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from plclient.utils.settings import catalogue_endpoint
-from plclient.api.apiclient import APIClientDetail, APIClientList
+from plclient.api.apiclient import APIClientDetail, APIClientList, get_session
 import streamlit as st
 import requests
 
@@ -26,11 +26,11 @@ class CatalogueDetail(APIClientDetail):
             if self.points is not None:
                 data['points'] = self.points
             if not self.url:
-                response = requests.post(self.api_endpoint, data=data)
+                response = get_session().post(self.api_endpoint, data=data)
             elif update_is_patch:
-                response = requests.patch(self.url, data=data)
+                response = get_session().patch(self.url, data=data)
             else:
-                response = requests.put(self.url, data=data)
+                response = get_session().put(self.url, data=data)
             response.raise_for_status()
             st.success('Catalogue element stored successfully!')
             return self
@@ -56,3 +56,5 @@ class CatalogueList(APIClientList):
     error: str | None = None
     data: list | None = None
     datainstance: type['APIClientDetail'] | None = None
+    params: dict | None = None
+    limit: int | None = None
@@ -2,7 +2,7 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from plclient.utils.settings import fidelity_programs_endpoint, cashback_endpoint, points_endpoint, levels_endpoint, \
     membership_endpoint
-from plclient.api.apiclient import APIClientDetail, APIClientList
+from plclient.api.apiclient import APIClientDetail, APIClientList, get_session
 import streamlit as st
 import requests
 
@@ -44,11 +44,11 @@ class FidelityProgramDetail(APIClientDetail):
             if self.shop_list is not None:
                 data['shop_list'] = self.shop_list
             if not self.url:
-                response = requests.post(self.api_endpoint, data=data)
+                response = get_session().post(self.api_endpoint, data=data)
             elif update_is_patch:
-                response = requests.patch(self.url, data=data)
+                response = get_session().patch(self.url, data=data)
             else:
-                response = requests.put(self.url, data=data)
+                response = get_session().put(self.url, data=data)
             response.raise_for_status()
             st.success('Fidelity program stored successfully!')
             return self
@@ -76,3 +76,5 @@ class FidelityProgramList(APIClientList):
     error: str | None = None
     data: list | None = None
     datainstance: type['APIClientDetail'] | None = None
+    params: dict | None = None
+    limit: int | None = None
@@ -1,7 +1,7 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from plclient.utils.settings import product_endpoint
-from plclient.api.apiclient import APIClientDetail, APIClientList
+from plclient.api.apiclient import APIClientDetail, APIClientList, get_session
 import streamlit as st
 import requests
 
@@ -41,11 +41,11 @@ class ProductDetail(APIClientDetail):
             if self.owning_users is not None:
                 data['owning_users'] = self.owning_users
             if not self.url:
-                response = requests.post(self.api_endpoint, data=data)
+                response = get_session().post(self.api_endpoint, data=data)
             elif update_is_patch:
-                response = requests.patch(self.url, data=data)
+                response = get_session().patch(self.url, data=data)
             else:
-                response = requests.put(self.url, data=data)
+                response = get_session().put(self.url, data=data)
             response.raise_for_status()
             st.success('Product element stored successfully!')
             return self
@@ -76,3 +76,5 @@ class ProductList(APIClientList):
     error: str | None = None
     data: list | None = None
     datainstance: type['APIClientDetail'] | None = None
+    params: dict | None = None
+    limit: int | None = None
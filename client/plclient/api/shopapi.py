@@ -1,7 +1,7 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from plclient.utils.settings import shops_endpoint
-from plclient.api.apiclient import APIClientDetail, APIClientList
+from plclient.api.apiclient import APIClientDetail, APIClientList, get_session
 import streamlit as st
 import requests
 
@@ -32,11 +32,11 @@ class ShopDetail(APIClientDetail):
             if self.employees is not None:
                 data['employees'] = self.employees
             if not self.url:
-                response = requests.post(self.api_endpoint, data=data)
+                response = get_session().post(self.api_endpoint, data=data)
             elif update_is_patch:
-                response = requests.patch(self.url, data=data)
+                response = get_session().patch(self.url, data=data)
             else:
-                response = requests.put(self.url, data=data)
+                response = get_session().put(self.url, data=data)
             response.raise_for_status()
             st.success('Shop created successfully!')
             return self
@@ -64,3 +64,5 @@ class ShopList(APIClientList):
     error: str | None = None
     data: list | None = None
     datainstance: type['APIClientDetail'] | None = None
+    params: dict | None = None
+    limit: int | None = None
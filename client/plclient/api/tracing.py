@@ -0,0 +1,74 @@
+from __future__ import annotations
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from time import time
+import requests
+
+
+@dataclass(frozen=True)
+class TracedCall:
+    method: str
+    url: str
+    status: int | None
+    size: int
+    elapsed: float
+    cached: bool
+    render: int
+    at: float
+
+
+class CallTrace:
+    """
+    Bounded buffer of the API calls made on behalf of a user
+    session, most recent last. Every call is tagged with the
+    render of the page it was made for.
+    """
+
+    def __init__(self, maxlen: int = 1000) -> None:
+        self.calls: deque[TracedCall] = deque(maxlen=maxlen)
+        self.render = 0
+
+    def record(self, method: str, url: str, response: requests.Response | None, elapsed: float,
+               cached: bool) -> None:
+        self.calls.append(TracedCall(
+            method=method,
+            url=url,
+            status=response.status_code if response is not None else None,
+            size=len(response.content) if response is not None else 0,
+            elapsed=elapsed,
+            cached=cached,
+            render=self.render,
+            at=time(),
+        ))
+
+    def render_calls(self) -> list[TracedCall]:
+        return [call for call in list(self.calls) if call.render == self.render]
+
+    def slowest(self, count: int = 5) -> list[TracedCall]:
+        return sorted((call for call in list(self.calls) if not call.cached),
+                      key=lambda call: call.elapsed, reverse=True)[:count]
+
+
+_trace: ContextVar[CallTrace | None] = ContextVar('api_trace', default=None)
+
+
+@contextmanager
+def tracing(trace: CallTrace):
+    """
+    Records into the given trace the API calls made within
+    this context, each one of them belonging to a new render.
+    """
+    trace.render += 1
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+def record_call(method: str, url: str, response: requests.Response | None, elapsed: float, cached: bool) -> None:
+    trace = _trace.get()
+    if trace is not None:
+        trace.record(method, url, response, elapsed, cached)
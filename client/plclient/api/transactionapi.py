@@ -1,7 +1,7 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from plclient.utils.settings import transaction_endpoint
-from plclient.api.apiclient import APIClientDetail, APIClientList
+from plclient.api.apiclient import APIClientDetail, APIClientList, get_session
 import streamlit as st
 import requests
 
@@ -17,6 +17,7 @@ class TransactionDetail(APIClientDetail):
     shop: str | None = None
     shopping_cart: list[str] | None = None
     total: float | None = None
+    reference: str | None = None
 
     def create_or_update(self, update_is_patch: bool = False) -> TransactionDetail:
         try:
@@ -32,11 +33,11 @@ class TransactionDetail(APIClientDetail):
             if self.shop is not None:
                 data['shop'] = self.shop
             if not self.url:
-                response = requests.post(self.api_endpoint, data=data)
+                response = get_session().post(self.api_endpoint, data=data)
             elif update_is_patch:
-                response = requests.patch(self.url, data=data)
+                response = get_session().patch(self.url, data=data)
             else:
-                response = requests.put(self.url, data=data)
+                response = get_session().put(self.url, data=data)
             response.raise_for_status()
             st.success(f'Order stored successfully! Total price was {response.json()["total"]}')
             return self
@@ -54,7 +55,8 @@ class TransactionDetail(APIClientDetail):
             'user': self.user,
             'shop': self.shop,
             'shopping_cart': self.shopping_cart,
-            'total': self.total
+            'total': self.total,
+            'reference': self.reference
         }
 
 
@@ -64,3 +66,5 @@ class TransactionList(APIClientList):
     error: str | None = None
     data: list | None = None
     datainstance: type['APIClientDetail'] | None = None
+    params: dict | None = None
+    limit: int | None = None
@@ -0,0 +1,215 @@
+from __future__ import annotations
+import json
+import sqlite3
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager, closing
+from threading import Condition, Event, Lock, Thread
+from time import sleep, time
+import requests
+from plclient.api.apiclient import get_session
+from plclient.api.transactionapi import TransactionDetail
+from plclient.utils.settings import transaction_batch_endpoint, transaction_queue_path, transaction_batch_size, \
+    transaction_flush_delay, transaction_retry_delay, transaction_max_retry_delay
+
+
+class TransactionQueue:
+    """
+    Durable queue of the transactions recorded by a point of sale.
+    Transactions are first stored in a local SQLite file, so that no
+    sale is lost while the backend is slow or unreachable, then sent
+    by a background thread in the order they were recorded, several
+    at a time, retrying with backoff until the backend answers.
+    Transactions the backend refuses, one by one or as a whole
+    batch, are set aside rather than sent again.
+
+    Every transaction carries a reference generated here, which lets
+    the backend ignore the transactions it has already stored when
+    a batch is sent again after a failure.
+    """
+
+    PENDING = 'PENDING'
+    REJECTED = 'REJECTED'
+    max_results = 256
+    # Client errors which may not occur again when the same batch is sent later
+    transient_statuses = (408, 429)
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.online = True
+        self.wakeup = Event()
+        self.uploaded = Condition()
+        self.results: OrderedDict[str, dict] = OrderedDict()
+        self.flusher: Thread | None = None
+        self.flusher_lock = Lock()
+        with self.connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS queued_transaction ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'reference TEXT NOT NULL UNIQUE, '
+                'payload TEXT NOT NULL, '
+                'status TEXT NOT NULL, '
+                'attempts INTEGER NOT NULL DEFAULT 0, '
+                'error TEXT, '
+                'queued_at REAL NOT NULL)'
+            )
+
+    @contextmanager
+    def connect(self):
+        with closing(sqlite3.connect(self.path, timeout=10)) as connection:
+            with connection:
+                yield connection
+
+    def start(self) -> None:
+        with self.flusher_lock:
+            if self.flusher is None:
+                self.flusher = Thread(target=self.run, name='transaction-queue-flusher', daemon=True)
+                self.flusher.start()
+
+    def enqueue(self, transaction: TransactionDetail) -> str:
+        """
+        Stores the given transaction in the queue, returning the
+        reference through which its outcome can be waited for.
+        """
+        reference = str(uuid.uuid4())
+        payload = {
+            'user': transaction.user,
+            'shop': transaction.shop,
+            'shopping_cart': transaction.shopping_cart or [],
+            'reference': reference,
+        }
+        with self.connect() as connection:
+            connection.execute(
+                'INSERT INTO queued_transaction (reference, payload, status, queued_at) VALUES (?, ?, ?, ?)',
+                (reference, json.dumps(payload), self.PENDING, time())
+            )
+        self.start()
+        self.wakeup.set()
+        return reference
+
+    def depth(self) -> int:
+        with self.connect() as connection:
+            return connection.execute(
+                'SELECT COUNT(*) FROM queued_transaction WHERE status = ?', (self.PENDING,)
+            ).fetchone()[0]
+
+    def rejected(self) -> list[tuple[str, str]]:
+        with self.connect() as connection:
+            return connection.execute(
+                'SELECT reference, error FROM queued_transaction WHERE status = ? ORDER BY id', (self.REJECTED,)
+            ).fetchall()
+
+    def wait(self, reference: str, timeout: float) -> dict | None:
+        """
+        Waits for the backend to answer about the transaction with the
+        given reference, returning its outcome as found in the response
+        of the batch endpoint, or None if it did not answer in time.
+        """
+        with self.uploaded:
+            self.uploaded.wait_for(lambda: reference in self.results, timeout=timeout)
+            return self.results.pop(reference, None)
+
+    def flush(self) -> bool:
+        """
+        Sends the oldest pending transactions to the backend with a
+        single request. Returns whether any transaction was sent.
+        """
+        with self.connect() as connection:
+            rows = connection.execute(
+                'SELECT id, reference, payload FROM queued_transaction WHERE status = ? ORDER BY id LIMIT ?',
+                (self.PENDING, transaction_batch_size)
+            ).fetchall()
+        if not rows:
+            return False
+        ids = [row[0] for row in rows]
+        try:
+            response = get_session().post(transaction_batch_endpoint, json=[json.loads(row[2]) for row in rows])
+            if 400 <= response.status_code < 500 and response.status_code not in self.transient_statuses:
+                # The batch as a whole was refused, and would be refused again if sent as is
+                self.settle(rows, [{'status': response.status_code, 'errors': self.errors_of(response)}] * len(rows))
+                return True
+            response.raise_for_status()
+            results = response.json()
+            if not isinstance(results, list) or len(results) != len(rows) or \
+                    not all(isinstance(result, dict) and 'status' in result for result in results):
+                # Not an outcome per transaction: the batch is sent again later, as if it was lost
+                raise ValueError(f'Unexpected response to a batch of {len(rows)} transactions')
+        except (requests.RequestException, ValueError) as ex:
+            with self.connect() as connection:
+                connection.execute(
+                    'UPDATE queued_transaction SET attempts = attempts + 1, error = ? WHERE id IN ({})'.format(
+                        ', '.join('?' * len(ids))),
+                    [str(ex)] + ids
+                )
+            raise
+        self.settle(rows, results)
+        return True
+
+    def settle(self, rows: list, results: list[dict]) -> None:
+        """
+        Removes from the queue the transactions the backend stored,
+        sets aside the ones it rejected, and hands the outcome of
+        each to whoever is waiting for it.
+        """
+        with self.connect() as connection:
+            for (row_id, reference, payload), result in zip(rows, results):
+                if result['status'] in (200, 201):
+                    connection.execute('DELETE FROM queued_transaction WHERE id = ?', (row_id,))
+                else:
+                    # Rejected transactions are set aside, not to hold back the following ones
+                    connection.execute(
+                        'UPDATE queued_transaction SET status = ?, attempts = attempts + 1, error = ? WHERE id = ?',
+                        (self.REJECTED, json.dumps(result.get('errors')), row_id)
+                    )
+        with self.uploaded:
+            self.results.update((row[1], result) for row, result in zip(rows, results))
+            while len(self.results) > self.max_results:
+                self.results.popitem(last=False)
+            self.uploaded.notify_all()
+
+    @staticmethod
+    def errors_of(response: requests.Response):
+        try:
+            return response.json()
+        except ValueError:
+            return response.text
+
+    def run(self) -> None:
+        retry_delay = transaction_retry_delay
+        # Transactions may be left over by a previous run
+        pending = True
+        while True:
+            self.wakeup.wait(timeout=retry_delay if pending else None)
+            self.wakeup.clear()
+            # Let the sales rung up in the meantime join the same batch
+            sleep(transaction_flush_delay)
+            try:
+                while self.flush():
+                    pass
+                self.online = True
+                retry_delay = transaction_retry_delay
+                pending = self.depth() > 0
+            except (requests.RequestException, ValueError, sqlite3.Error):
+                self.online = False
+                retry_delay = min(retry_delay * 2, transaction_max_retry_delay)
+                pending = True
+
+
+_queue: TransactionQueue | None = None
+_queue_lock = Lock()
+
+
+def get_transaction_queue() -> TransactionQueue:
+    """
+    Returns the transaction queue of this process, whose
+    background flusher sends any transaction left over by
+    a previous run as soon as the queue is first used.
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = TransactionQueue(transaction_queue_path)
+                _queue.start()
+    return _queue
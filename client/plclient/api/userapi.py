@@ -1,6 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from plclient.api.apiclient import APIClientDetail, APIClientList
+from plclient.api.apiclient import APIClientDetail, APIClientList, get_session
 from plclient.utils.hashers import hash_password
 from plclient.utils.settings import users_endpoint, auth_endpoint
 import streamlit as st
@@ -19,6 +19,7 @@ class UserDetail(APIClientDetail):
     phone: str | None = None
     groups: list | None = None
     avatar: str | None = None
+    avatar_variants: dict | None = None
     bio: str | None = None
     location: str | None = None
 
@@ -38,11 +39,11 @@ class UserDetail(APIClientDetail):
             if self.bio is not None:
                 data['bio'] = self.bio
             if not self.url:
-                response = requests.post(self.api_endpoint, data=data)
+                response = get_session().post(self.api_endpoint, data=data)
             elif update_is_patch:
-                response = requests.patch(self.url, data=data)
+                response = get_session().patch(self.url, data=data)
             else:
-                response = requests.put(self.url, data=data)
+                response = get_session().put(self.url, data=data)
             response.raise_for_status()
             st.success('User stored successfully!')
             return self
@@ -52,7 +53,7 @@ class UserDetail(APIClientDetail):
 
     def authenticate(self) -> dict:
         try:
-            response = requests.post(auth_endpoint, data={'username': self.username, 'password': self.password})
+            response = get_session().post(auth_endpoint, data={'username': self.username, 'password': self.password})
             response.raise_for_status()
             return response.json()
         except requests.HTTPError as ex:
@@ -70,6 +71,7 @@ class UserDetail(APIClientDetail):
             'phone': self.phone,
             'groups': self.groups,
             'avatar': self.avatar,
+            'avatar_variants': self.avatar_variants,
             'bio': self.bio,
             'location': self.location
         }
@@ -81,3 +83,5 @@ class UserList(APIClientList):
     error: str | None = None
     data: list | None = None
     datainstance: type['APIClientDetail'] | None = None
+    params: dict | None = None
+    limit: int | None = None
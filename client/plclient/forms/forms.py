@@ -4,7 +4,7 @@ import pandas as pd
 from st_aggrid import AgGrid, GridOptionsBuilder, AgGridReturn, ColumnsAutoSizeMode
 from typing import Protocol, runtime_checkable, Any
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from plclient.api.apiclient import APIClientDetail, APIClientList
 
 
@@ -29,14 +29,38 @@ class Table:
     hidden_columns: list[str] | None = None
     selection_mode: str = field(default="single")
     key: str | None = None
+    filters: dict | None = None
+    limit: int | None = None
+    paginated: bool = False
+    page_size: int = 25
+    ordering: list[str] | None = None
 
     def show(self) -> Any:
-        data = self.element.get()
         #if len(data) == 0:
         #    return st.text(f"No data registered yet!")
-        df = pd.DataFrame.from_dict(data)[self.columns] if len(data) != 0 else pd.DataFrame(columns=self.columns)
+        if self.paginated:
+            df, pages = self.get_page()
+        else:
+            frames = [
+                pd.DataFrame.from_records(page, columns=self.columns)
+                for page in self.get_element().iter_pages(limit=self.limit)
+            ]
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=self.columns)
         builder = GridOptionsBuilder.from_dataframe(df)
-        builder.configure_selection(selection_mode=self.selection_mode)
+        if self.paginated:
+            # The grid only holds the current page: sorting and filtering are up to the backend
+            builder.configure_default_column(sortable=False, filterable=False)
+        key = self.key
+        if self.keeps_selection():
+            selected = st.session_state.get(self.state_key('selected'), {})
+            builder.configure_selection(
+                selection_mode=self.selection_mode,
+                pre_selected_rows=[i for i, url in enumerate(df['url']) if url in selected]
+            )
+            # A grid per page, so that the rows picked on it are selected when it loads
+            key = f"{self.state_key('grid')}-{hash(tuple(df['url']))}"
+        else:
+            builder.configure_selection(selection_mode=self.selection_mode)
         if self.hidden_columns is not None:
             builder.configure_columns(column_names=self.hidden_columns, hide=True)
         go = builder.build()
@@ -46,7 +70,68 @@ class Table:
             columns_auto_size_mode=ColumnsAutoSizeMode.FIT_ALL_COLUMNS_TO_VIEW,
             theme="alpine",
             enable_enterprise_modules=False,
-            key=self.key
+            key=key
         )
         #st.write(filtered_df.selected_rows)
+        if self.keeps_selection():
+            filtered_df.selected_rows = self.keep_selection(filtered_df)
+        if self.paginated:
+            st.number_input(f'Page (of {pages})', min_value=1, max_value=pages, key=self.state_key('page'))
         return filtered_df
+
+    def state_key(self, name: str) -> str:
+        return f'{self.key or self.element.api_endpoint + str(self.filters)}-{name}'
+
+    def keeps_selection(self) -> bool:
+        return self.paginated and self.selection_mode == 'multiple'
+
+    def keep_selection(self, grid: AgGridReturn) -> list[dict]:
+        """
+        Merges the rows picked on the page shown into the ones picked
+        on the other pages, kept by url in the session state, since the
+        grid only knows the rows of its own page.
+        Returns the rows selected across all pages.
+        """
+        selected_key = self.state_key('selected')
+        selected = st.session_state.get(selected_key, {})
+        if grid.data is not None and 'url' in grid.data:
+            # Nothing is reported before the grid first loads: the selection is left as it is
+            shown = set(grid.data['url'])
+            selected = {url: row for url, row in selected.items() if url not in shown}
+            selected.update((row['url'], row) for row in grid.selected_rows)
+            st.session_state[selected_key] = selected
+        return list(selected.values())
+
+    def get_page(self) -> tuple[pd.DataFrame, int]:
+        """
+        Loads only the page of the collection currently shown, sorted
+        on the backend by the field chosen through the table controls.
+        Returns the page along with the number of available pages.
+        """
+        element = self.get_element()
+        page_key = self.state_key('page')
+        if self.ordering:
+            reset_page = lambda: st.session_state.update({page_key: 1})
+            sort_col, direction_col = st.columns(2)
+            field_name = sort_col.selectbox('Sort by', self.ordering, key=self.state_key('ordering'),
+                                            on_change=reset_page)
+            descending = direction_col.toggle('Descending', key=self.state_key('descending'), on_change=reset_page)
+            element = replace(element, params={**(element.params or {}),
+                                               'ordering': ('-' if descending else '') + field_name})
+        page = st.session_state.get(page_key, 1)
+        data, count = element.get_page(page, self.page_size)
+        pages = max(1, -(-count // self.page_size))
+        if page > pages:
+            # The collection shrank since the page was chosen
+            st.session_state[page_key] = page = pages
+            data, count = element.get_page(page, self.page_size)
+        return pd.DataFrame.from_records(data, columns=self.columns), pages
+
+    def get_element(self) -> APIClientList:
+        """
+        Returns the collection to show, pushing the table filters
+        down to the server as query string parameters.
+        """
+        if self.filters is None:
+            return self.element
+        return replace(self.element, params={**(self.element.params or {}), **self.filters})
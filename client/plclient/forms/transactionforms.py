@@ -3,7 +3,9 @@ from plclient.forms.forms import Form, Table
 from plclient.api.productapi import ProductDetail, ProductList
 from plclient.api.shopapi import ShopDetail
 from plclient.api.transactionapi import TransactionDetail
+from plclient.api.transactionqueue import get_transaction_queue
 from plclient.api.userapi import UserDetail
+from plclient.utils.settings import transaction_confirm_timeout
 import streamlit as st
 
 
@@ -64,4 +66,13 @@ class TransactionCreateForm(Form):
                     user=self.user.url,
                     shop=self.shop.url,
                     shopping_cart=self.shopping_cart
-                ).create_or_update()
+                )
+                queue = get_transaction_queue()
+                reference = queue.enqueue(self.element)
+                outcome = queue.wait(reference, timeout=transaction_confirm_timeout) if queue.online else None
+                if outcome is None:
+                    st.warning('The server cannot be reached right now: the order was saved and will be sent later')
+                elif outcome['status'] in (200, 201):
+                    st.success(f'Order stored successfully! Total price was {outcome["transaction"]["total"]}')
+                else:
+                    st.error('Some error occurred during transaction creation or update')
@@ -1,6 +1,10 @@
+from plclient.api.apiclient import render_scope, session_cookies, fetch_all
+from plclient.api.tracing import tracing
 from plclient.api.shopapi import ShopDetail
+from plclient.api.transactionqueue import get_transaction_queue
 from plclient.api.userapi import UserDetail
-from plclient.utils.settings import users_endpoint, shops_endpoint
+from plclient.utils.settings import users_endpoint, shops_endpoint, api_debug_panel
+from plclient.views.debugviews import APICallsPanel, session_trace
 from st_pages import hide_pages
 import streamlit as st
 
@@ -18,16 +22,22 @@ if __name__ == '__main__':
         initial_sidebar_state="expanded",
     )
     hide_pages(['main', 'mainpage', 'businessownerdashboard', 'businessownerloginpage', 'cashierdashboard', 'cashierloginpage', 'customerdashboard', 'customerloginpage'])
-    userdata = UserDetail(url=st.session_state['user_url']).get()
-    shopdata = ShopDetail(url=st.session_state['shop_url']).get()
-    user_view = GenericUserView(userdata)
-    fidelity_program_view = CashierFidelityProgramView(shopdata, user_view)
-    shop_view = CashierShopView(shopdata, user_view, fidelity_program_view)
-    transaction_view = CashierTransactionView(shop=shopdata, users=user_view)
-    # transaction_view = CustomerTransactionView(userdata, shop_view)
-    CashierDashboard(
-        user_view,
-        shop_view,
-        fidelity_program_view,
-        transaction_view
-    ).open_view()
+    st.sidebar.metric('Orders waiting to be sent', get_transaction_queue().depth())
+    with render_scope(session_cookies()), tracing(session_trace()) as trace:
+        userdata, shopdata = fetch_all(
+            UserDetail(url=st.session_state['user_url']),
+            ShopDetail(url=st.session_state['shop_url'])
+        )
+        user_view = GenericUserView(userdata)
+        fidelity_program_view = CashierFidelityProgramView(shopdata, user_view)
+        shop_view = CashierShopView(shopdata, user_view, fidelity_program_view)
+        transaction_view = CashierTransactionView(shop=shopdata, users=user_view)
+        # transaction_view = CustomerTransactionView(userdata, shop_view)
+        CashierDashboard(
+            user_view,
+            shop_view,
+            fidelity_program_view,
+            transaction_view
+        ).open_view()
+        if api_debug_panel:
+            APICallsPanel(trace).show()
@@ -1,9 +1,13 @@
+from plclient.api.apiclient import render_scope, session_cookies
+from plclient.api.tracing import tracing
 from plclient.api.userapi import UserDetail
 from plclient.views.fidelityprogramviews import ReadOnlyFidelityProgramView
 from plclient.views.shopviews import CustomerShopView
 from plclient.views.transactionviews import CustomerTransactionView
 from plclient.views.userviews import GenericUserView
 from plclient.views.views import UserDashboard
+from plclient.utils.settings import api_debug_panel
+from plclient.views.debugviews import APICallsPanel, session_trace
 from st_pages import hide_pages
 import streamlit as st
 
@@ -16,14 +20,17 @@ if __name__ == '__main__':
         initial_sidebar_state="expanded",
     )
     hide_pages(['main', 'mainpage', 'businessownerdashboard', 'businessownerloginpage', 'cashierdashboard', 'cashierloginpage', 'customerdashboard', 'customerloginpage'])
-    userdata = UserDetail(url=st.session_state['user_url']).get()
-    user_view = GenericUserView(userdata)
-    fidelity_program_view = ReadOnlyFidelityProgramView(userdata)
-    shop_view = CustomerShopView(fidelity_program_view)
-    transaction_view = CustomerTransactionView(userdata, shop_view)
-    UserDashboard(
-        user_view,
-        shop_view,
-        fidelity_program_view,
-        transaction_view
-    ).open_view()
+    with render_scope(session_cookies()), tracing(session_trace()) as trace:
+        userdata = UserDetail(url=st.session_state['user_url']).get()
+        user_view = GenericUserView(userdata)
+        fidelity_program_view = ReadOnlyFidelityProgramView(userdata)
+        shop_view = CustomerShopView(fidelity_program_view)
+        transaction_view = CustomerTransactionView(userdata, shop_view)
+        UserDashboard(
+            user_view,
+            shop_view,
+            fidelity_program_view,
+            transaction_view
+        ).open_view()
+        if api_debug_panel:
+            APICallsPanel(trace).show()
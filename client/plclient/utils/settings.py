@@ -7,12 +7,63 @@ fidelity_programs_endpoint = backend_url + 'fidelityprograms/'
 catalogue_endpoint = backend_url + 'catalogue/'
 product_endpoint = backend_url + 'product/'
 transaction_endpoint = backend_url + 'transactions/'
+transaction_batch_endpoint = transaction_endpoint + 'batch/'
 
 cashback_endpoint = fidelity_programs_endpoint + 'cashbackprograms/'
 levels_endpoint = fidelity_programs_endpoint + 'levelsprograms/'
 points_endpoint = fidelity_programs_endpoint + 'pointsprograms/'
 membership_endpoint = fidelity_programs_endpoint + 'membershipprograms/'
 
+# HTTP connection pool shared by every API client
+http_pool_size = 10
+http_connect_timeout = 3.05
+http_read_timeout = 10.0
+http_retries = 3
+http_backoff_factor = 0.3
+# Maximum number of resources fetched at the same time when resolving a list
+http_fanout_workers = 8
+# Maximum number of resources fetched by primary key with a single request,
+# which must not exceed the backend maximum page size
+http_batch_size = 100
+# Elements per page when walking a whole collection, which must not exceed
+# the backend maximum page size either
+http_page_size = 100
+
+# In-memory cache of backend responses: maximum number of entries, seconds
+# each resource type is kept for and resource types whose cached responses
+# become stale when a resource of a given type is written
+http_cache_size = 512
+http_cache_ttls = {
+    users_endpoint: 30,
+    shops_endpoint: 60,
+    fidelity_programs_endpoint: 60,
+    product_endpoint: 60,
+    catalogue_endpoint: 10,
+    transaction_endpoint: 10,
+}
+http_cache_invalidates = {
+    users_endpoint: (catalogue_endpoint, transaction_endpoint, shops_endpoint),
+    shops_endpoint: (fidelity_programs_endpoint, product_endpoint, transaction_endpoint),
+    fidelity_programs_endpoint: (catalogue_endpoint, product_endpoint),
+    product_endpoint: (transaction_endpoint,),
+    transaction_endpoint: (catalogue_endpoint, product_endpoint),
+}
+
+# Local queue of the transactions recorded by a point of sale: SQLite file,
+# maximum number of transactions sent with a single request, seconds waited
+# for further transactions to join a batch, bounds in seconds of the backoff
+# between attempts while the backend is unreachable, and seconds a cashier
+# waits for the confirmation of a transaction before it is left to the queue
+transaction_queue_path = 'transactions.sqlite3'
+transaction_batch_size = 50
+transaction_flush_delay = 0.2
+transaction_retry_delay = 1.0
+transaction_max_retry_delay = 30.0
+transaction_confirm_timeout = 2.0
+
+# Whether dashboards show in their sidebar the API calls made to render them
+api_debug_panel = False
+
 
 def coefficient_limits(program_type: str) -> tuple[float, float]:
     match program_type:
@@ -0,0 +1,55 @@
+from __future__ import annotations
+import pandas as pd
+import streamlit as st
+from plclient.api.tracing import CallTrace, TracedCall
+
+
+def session_trace() -> CallTrace:
+    """
+    Returns the trace of the API calls made on behalf of the current user session.
+    """
+    if 'api_trace' not in st.session_state:
+        st.session_state['api_trace'] = CallTrace()
+    return st.session_state['api_trace']
+
+
+class APICallsPanel:
+    """
+    Sidebar panel listing the API calls made to render the current
+    page, along with their totals and the slowest calls of the session.
+    """
+
+    def __init__(self, trace: CallTrace) -> None:
+        self.trace = trace
+
+    def show(self) -> None:
+        calls = self.trace.render_calls()
+        fetched = [call for call in calls if not call.cached]
+        with st.sidebar.expander(f'API calls ({len(calls)})'):
+            calls_col, hits_col = st.columns(2)
+            calls_col.metric('Requests', len(fetched))
+            hits_col.metric('Cache hits', len(calls) - len(fetched))
+            time_col, size_col = st.columns(2)
+            time_col.metric('Time', f'{sum(call.elapsed for call in fetched) * 1000:.0f} ms')
+            size_col.metric('Received', f'{sum(call.size for call in fetched) / 1024:.1f} kB')
+            st.caption('This page')
+            st.dataframe(self.as_dataframe(calls), hide_index=True)
+            st.caption('Slowest calls of the session')
+            st.dataframe(self.as_dataframe(self.trace.slowest()), hide_index=True)
+
+    @staticmethod
+    def as_dataframe(calls: list[TracedCall]) -> pd.DataFrame:
+        return pd.DataFrame(
+            [
+                {
+                    'method': call.method,
+                    'url': call.url,
+                    'status': call.status,
+                    'ms': round(call.elapsed * 1000, 1),
+                    'bytes': call.size,
+                    'cached': call.cached,
+                }
+                for call in calls
+            ],
+            columns=['method', 'url', 'status', 'ms', 'bytes', 'cached']
+        )
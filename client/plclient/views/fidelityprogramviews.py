@@ -1,7 +1,7 @@
 from __future__ import annotations
 from typing import Protocol, runtime_checkable
 from dataclasses import dataclass
-from plclient.api.catalogueapi import CatalogueDetail
+from plclient.api.catalogueapi import CatalogueDetail, CatalogueList
 from plclient.api.fidelityprogramapi import FidelityProgramDetail, FidelityProgramList
 from plclient.api.shopapi import ShopDetail, ShopList
 from plclient.api.userapi import UserDetail
@@ -45,6 +45,7 @@ class ReadOnlyFidelityProgramView:
         if user.url is None or user.username is None:
             raise ValueError('User data is required')
         self.user = user
+        self.joined_programs: dict[str, str] | None = None
 
     def open_view(self):
         with st.container() as container:
@@ -96,21 +97,35 @@ class ReadOnlyFidelityProgramView:
             prize_list=CustomerProductView(fidelity_program=program).get_all_products_by_program()
         )
 
+    def get_joined_programs(self) -> dict[str, str]:
+        """
+        Returns the url of the catalogue element of each fidelity
+        program joined by the user, keyed by program url. They are
+        loaded once with a single request, and loaded again only
+        after the user joins or leaves a program.
+        """
+        if self.joined_programs is None:
+            self.joined_programs = {
+                element['fidelity_program']: element['url']
+                for element in CatalogueList(api_endpoint=catalogue_endpoint + 'byuser/' + self.user.username).get()
+            }
+        return self.joined_programs
+
     def user_is_joined(self, programurl: str) -> bool:
-        program = FidelityProgramDetail(url=programurl).get()
-        return CatalogueDetail(url=catalogue_endpoint + self.user.username + '/' + program.name).get().error is None
+        return programurl in self.get_joined_programs()
 
     def join_fidelity_program(self, programurl: str):
         try:
             CatalogueDetail(customer=self.user.url, fidelity_program=programurl).create_or_update()
+            self.joined_programs = None
             st.success('Fidelity program joined!')
         except requests.HTTPError as ex:
             return st.error(str(ex))
 
     def leave_fidelity_program(self, programurl: str):
         try:
-            program = FidelityProgramDetail(url=programurl).get()
-            CatalogueDetail(url=catalogue_endpoint + self.user.username + '/' + program.name).get().delete()
+            CatalogueDetail(url=self.get_joined_programs().get(programurl)).delete()
+            self.joined_programs = None
             st.success('Fidelity program left')
         except requests.HTTPError as ex:
             return st.error(str(ex))
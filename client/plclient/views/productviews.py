@@ -71,20 +71,26 @@ class CustomerProductView:
         if self.shop.url is None or self.shop.name is None:
             raise ValueError('Shop data is required')
         return Table(
-            element=ProductList(api_endpoint=product_endpoint + 'byshop/' + self.shop.name),
+            element=ProductList(),
             columns=['url', 'name', 'value', 'fidelity_program'],
             hidden_columns=['url'],
-            selection_mode='multiple'
+            selection_mode='multiple',
+            filters={'shop': self.shop.name},
+            paginated=True,
+            ordering=['id', 'value']
         )
 
     def get_all_products_by_program(self):
         if self.fidelity_program.url is None or self.fidelity_program.name is None:
             raise ValueError('Fidelity program data is required')
         return Table(
-            element=ProductList(api_endpoint=product_endpoint + 'byprogram/' + self.fidelity_program.name),
+            element=ProductList(),
             columns=['url', 'name', 'value', 'fidelity_program'],
             hidden_columns=['url'],
-            selection_mode='multiple'
+            selection_mode='multiple',
+            filters={'fidelity_program': self.fidelity_program.name},
+            paginated=True,
+            ordering=['id', 'value']
         )
 
     def get_all_owned_prizes_by_shop(self, user: UserDetail):
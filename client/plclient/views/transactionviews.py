@@ -2,6 +2,7 @@ from __future__ import annotations
 from typing import Protocol, runtime_checkable
 from dataclasses import dataclass
 
+from plclient.api.apiclient import fetch_all
 from plclient.api.shopapi import ShopDetail
 from plclient.api.transactionapi import TransactionDetail
 from plclient.api.userapi import UserDetail
@@ -52,8 +53,10 @@ class CustomerTransactionView:
     def create_transaction(self, userurl: str | None = None, shopurl: str | None = None):
         if shopurl is None:
             raise ValueError('You must choose a shop to start an order')
-        user = self.user if userurl is None else UserDetail(url=userurl).get()
-        shop = ShopDetail(url=shopurl).get()
+        if userurl is None:
+            user, shop = self.user, ShopDetail(url=shopurl).get()
+        else:
+            user, shop = fetch_all(UserDetail(url=userurl), ShopDetail(url=shopurl))
         return TransactionCreateForm(
             user=user,
             shop=shop,
@@ -88,8 +91,10 @@ class CashierTransactionView:
     def create_transaction(self, userurl: str | None = None, shopurl: str | None = None):
         if userurl is None:
             raise ValueError('You must choose a user to start an order')
-        shop = self.shop if shopurl is None else ShopDetail(url=shopurl).get()
-        user = UserDetail(url=userurl).get()
+        if shopurl is None:
+            user, shop = UserDetail(url=userurl).get(), self.shop
+        else:
+            user, shop = fetch_all(UserDetail(url=userurl), ShopDetail(url=shopurl))
         return TransactionCreateForm(
             user=user,
             shop=shop,
@@ -50,7 +50,9 @@ class NoUserView:
         return Table(
             element=UserList(),
             columns=['url', 'username', 'email', 'phone'],
-            hidden_columns=['url']
+            hidden_columns=['url'],
+            paginated=True,
+            ordering=['username', 'date_joined']
         )
 
 
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -58,6 +59,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "server.routers.ReadReplicaMiddleware",
 ]
 
 ROOT_URLCONF = "project.urls"
@@ -84,13 +86,97 @@ WSGI_APPLICATION = "project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Production profile: readers never block the writer thanks to WAL
+# journaling, writers queue on the busy timeout and settlement takes
+# the write lock upfront. Run "manage.py benchmark_sqlite" to compare
+# it against the default SQLite settings.
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    # Milliseconds a connection waits for a lock before failing
+    "busy_timeout": 5000,
+    # Durable across application crashes, only fsync on checkpoints
+    "synchronous": "NORMAL",
+    # Negative sizes are in KiB: 64 MiB of page cache per connection
+    "cache_size": -65536,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "server.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            "init_command": ";".join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+            "transaction_mode": "IMMEDIATE",
+        },
+    },
+    # Copy of the primary refreshed by "manage.py refresh_replica", to be
+    # pointed at a real replica in production. Writes never reach it.
+    "replica": {
+        "ENGINE": "server.backends.sqlite3",
+        "NAME": BASE_DIR / "replica.sqlite3",
+        "OPTIONS": {
+            "init_command": ";".join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+                                     if name != "journal_mode") + ";PRAGMA query_only=ON",
+        },
+        "TEST": {
+            "MIRROR": "default",
+        },
+    },
+}
+
+DATABASE_ROUTERS = ["server.routers.ReadReplicaRouter"]
+
+# Alias the reads of the list actions and of the user, shop and fidelity
+# program endpoints are sent to, None to read everything from the primary.
+READ_REPLICA_DATABASE = "replica"
+
+# Seconds a client reads from the primary after writing, which must
+# exceed the replica lag for clients to read back what they wrote.
+READ_REPLICA_PIN_SECONDS = 15
+
+# Seconds between two copies of the primary made by refresh_replica.
+READ_REPLICA_REFRESH_INTERVAL = 5
+
+# Seconds past which a copy is too old to read from, e.g. when
+# refresh_replica is not watching: reads go to the primary instead.
+# Must not exceed READ_REPLICA_PIN_SECONDS.
+READ_REPLICA_MAX_AGE = 3 * READ_REPLICA_REFRESH_INTERVAL
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "plserver",
     }
 }
 
+# Seconds a customer dashboard summary is kept in cache. Settlement
+# invalidates it right away, this bounds staleness from prize updates.
+DASHBOARD_CACHE_TIMEOUT = 60
+
+# Verified API tokens kept in memory, and seconds each is trusted for
+# before being checked again. Logout and token rotation drop them.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 60
+
+# Seconds the prizes of a fidelity program are indexed in memory for.
+# Storing a prize drops them right away in the process storing it,
+# this bounds staleness in the others and from bulk updates.
+PRIZE_THRESHOLD_TTL = 60
+
+# Passwords checked at once on login, hashing being CPU bound, and
+# logins allowed to wait for a check: the ones past them get a 429 and
+# retry after a few seconds. Each check takes about 0.2s of CPU.
+LOGIN_VERIFY_WORKERS = os.cpu_count() or 1
+LOGIN_VERIFY_BACKLOG = 4 * LOGIN_VERIFY_WORKERS
+LOGIN_RETRY_AFTER = 2
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -128,6 +214,19 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# User uploaded files, e.g. avatars, along with the resized variants
+# generated from them, served with far-future caching: stored files
+# never change, new uploads get new names.
+MEDIA_ROOT = BASE_DIR / "media"
+MEDIA_URL = "media/"
+MEDIA_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Square thumbnails generated for every avatar, by name and side in pixels.
+AVATAR_VARIANTS = {
+    "small": 64,
+    "medium": 256,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -138,7 +237,12 @@ AUTH_USER_MODEL = 'server.User'
 
 # REST framework settings
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'server.authentication.CachedTokenAuthentication',
+        'server.authentication.PrimarySessionAuthentication',
+        'server.authentication.PrimaryBasicAuthentication',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'server.pagination.PageSizePagination',
     'PAGE_SIZE': 10,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -149,4 +253,9 @@ SPECTACULAR_SETTINGS = {
     'DESCRIPTION': 'RESTFul API for Loyalty Platform app',
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
-}
\ No newline at end of file
+}
+
+# Where "manage.py generate_schema" stores the schema of each code
+# version, and seconds clients may use it before revalidating.
+SCHEMA_ARTIFACT_DIR = BASE_DIR / "schema"
+SCHEMA_CACHE_MAX_AGE = 24 * 60 * 60
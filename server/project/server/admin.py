@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import User, Shop, FidelityProgram, Catalogue, Product, Transaction
+from .models import User, Shop, FidelityProgram, Catalogue, Product, Transaction, OutboxEvent, \
+    RollupWatermark, SettlementRollup, ShopDailySales, SettledProduct
 
 # Register your models here.
 
@@ -8,4 +9,9 @@ admin.site.register(Shop)
 admin.site.register(FidelityProgram)
 admin.site.register(Catalogue)
 admin.site.register(Product)
-admin.site.register(Transaction)
\ No newline at end of file
+admin.site.register(Transaction)
+admin.site.register(OutboxEvent)
+admin.site.register(RollupWatermark)
+admin.site.register(SettlementRollup)
+admin.site.register(ShopDailySales)
+admin.site.register(SettledProduct)
\ No newline at end of file
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import post_migrate
 
 
 class ServerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "server"
+
+    def ready(self):
+        from . import signals
+        from .search import create_search_index
+        from .filters import check_indexed_views
+        post_migrate.connect(create_search_index, sender=self)
+        checks.register(check_indexed_views, checks.Tags.urls)
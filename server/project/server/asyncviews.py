@@ -0,0 +1,217 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
+from rest_framework.request import Request
+from rest_framework.reverse import reverse
+from rest_framework.utils.encoders import JSONEncoder
+from .authentication import password_verifier, VerifierSaturated
+from .avatars import variant_urls
+from .models import User, FidelityProgram, Catalogue, Product, preloaded_programs
+from .views import ShopViewSet, FidelityProgramViewSet, CatalogueViewSet, ProductViewSet
+
+
+def json_response(data, status=200):
+    # Compact, as rendered by DRF views
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False,
+                        json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+
+
+class AsyncReadView(View):
+    """
+    Serves the GET requests of a viewset route through the async ORM,
+    so that under ASGI a slow read waits on the database without
+    holding a worker thread. The response is the one the viewset
+    would give, built by the viewset filters, paginator and serializer.
+
+    Requests are authenticated, and checked against the permissions
+    and throttles of the viewset, before being read. Every other
+    request, any refused one, as well as browsers asking for the
+    browsable API, is handed over to the viewset itself.
+    """
+    viewset = None
+    action = None
+    actions = None
+    viewset_view = None
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        viewset_view = cls.viewset.as_view(cls.actions)
+        view = super().as_view(viewset_view=viewset_view, **initkwargs)
+        # Let ReadReplicaMiddleware route the reads as for the viewset route
+        view.cls = cls.viewset
+        view.actions = cls.actions
+        view.initkwargs = viewset_view.initkwargs
+        # The viewset enforces CSRF checks itself, as every DRF view does
+        view.csrf_exempt = True
+        return view
+
+    async def get(self, request, *args, **kwargs):
+        if 'text/html' in request.headers.get('Accept', ''):
+            return await self.delegate(request, *args, **kwargs)
+        viewset = self.viewset(format_kwarg=None, action_map=self.actions, args=args, kwargs=kwargs)
+        viewset.request = viewset.initialize_request(request, *args, **kwargs)
+        viewset.headers = viewset.default_response_headers
+        try:
+            # Authentication, permissions and throttles, as checked by the viewset
+            await sync_to_async(viewset.initial)(viewset.request, *args, **kwargs)
+        except APIException:
+            # Refused: the viewset answers with the very same error and headers
+            return await self.delegate(request, *args, **kwargs)
+        try:
+            data = await self.read(viewset, *args, **kwargs)
+        except APIException as ex:
+            detail = ex.detail if isinstance(ex.detail, (dict, list)) else {'detail': ex.detail}
+            return json_response(detail, status=ex.status_code)
+        if isinstance(data, HttpResponse):
+            return data
+        return json_response(data)
+
+    async def delegate(self, request, *args, **kwargs):
+        return await sync_to_async(self.viewset_view)(request, *args, **kwargs)
+
+    post = put = patch = delete = options = delegate
+
+    async def read(self, viewset, *args, **kwargs):
+        raise NotImplementedError('read() must be implemented.')
+
+
+class AsyncListView(AsyncReadView):
+    """
+    Serves a page of the collection of a viewset, filtered and
+    sorted as the query string asks, as the list action does.
+    """
+    action = 'list'
+    actions = {'get': 'list', 'post': 'create'}
+    prefetch = ()
+
+    async def read(self, viewset):
+        queryset = viewset.filter_queryset(viewset.get_queryset()).prefetch_related(*self.prefetch)
+        page = await viewset.paginator.apaginate_queryset(queryset, viewset.request, view=viewset)
+        return viewset.paginator.get_paginated_response(viewset.get_serializer(page, many=True).data).data
+
+
+class ShopListView(AsyncListView):
+    viewset = ShopViewSet
+    prefetch = ['employees']
+
+
+class FidelityProgramListView(AsyncListView):
+    viewset = FidelityProgramViewSet
+    prefetch = ['shop_list']
+
+
+class ProductListView(AsyncListView):
+    viewset = ProductViewSet
+    prefetch = ['owning_users']
+
+    async def read(self, viewset):
+        # Programs are few: preloading all of them spares two queries per product
+        programs = [program async for program in FidelityProgram.objects.prefetch_related('shop_list')]
+        with preloaded_programs(programs):
+            return await super().read(viewset)
+
+
+class CatalogueByUserView(AsyncReadView):
+    viewset = CatalogueViewSet
+    action = 'get_by_user'
+    actions = {'get': 'get_by_user'}
+
+    async def read(self, viewset, customer):
+        catalogue = [cat async for cat in Catalogue.objects.filter(customer_id=customer)]
+        return viewset.get_serializer(catalogue, many=True).data
+
+
+class AllAvailablePrizesView(AsyncReadView):
+    viewset = CatalogueViewSet
+    action = 'all_available_prizes'
+    actions = {'get': 'all_available_prizes'}
+
+    async def read(self, viewset, customer):
+        programs = [program async for program in FidelityProgram.objects.filter(
+            catalogue_fidelity_program__customer_id=customer).prefetch_related('shop_list')]
+        with preloaded_programs(programs):
+            prizes = [prize async for prize in Product.redeemable_by(customer).prefetch_related('owning_users')
+                      .order_by('fidelity_program', 'value')]
+        return ProductViewSet.serializer_class(prizes, many=True, context=viewset.get_serializer_context()).data
+
+
+class AvailablePrizesView(AsyncReadView):
+    viewset = CatalogueViewSet
+    action = 'available_prizes'
+    actions = {'get': 'available_prizes'}
+
+    async def read(self, viewset, customer, program):
+        try:
+            catalogue = await Catalogue.objects.aget(customer_id=customer, fidelity_program_id=program)
+        except Catalogue.DoesNotExist:
+            return HttpResponse(status=404)
+        programs = [fidelity_program async for fidelity_program in FidelityProgram.objects.filter(
+            pk=program).prefetch_related('shop_list')]
+        with preloaded_programs(programs):
+            prizes = [prize async for prize in Product.objects.filter(
+                fidelity_program_id=program, value__lte=catalogue.points, is_persistent=True
+            ).prefetch_related('owning_users')]
+        return ProductViewSet.serializer_class(prizes, many=True, context=viewset.get_serializer_context()).data
+
+
+class LoginView(View):
+    """
+    API endpoint issuing the token of a user given their credentials.
+    The user and their token, if any, are read with a single query,
+    while the password is checked by password_verifier: when too many
+    logins are waiting for it, the request is refused with a 429
+    rather than left to time out.
+    """
+    parsers = [JSONParser(), FormParser(), MultiPartParser()]
+    invalid_data = 'Invalid data. Expected a dictionary, but got {datatype}.'
+    invalid_credentials = 'Unable to log in with provided credentials.'
+    saturated = 'Too many logins in progress, please retry in a few seconds.'
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Credentials are all it takes, as for DRF's obtain_auth_token
+        view.csrf_exempt = True
+        return view
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            data = Request(request, parsers=self.parsers).data
+        except APIException as ex:
+            return json_response({'detail': ex.detail}, status=ex.status_code)
+        if not isinstance(data, dict):
+            return json_response({'non_field_errors': [self.invalid_data.format(datatype=type(data).__name__)]},
+                                 status=400)
+        errors = {field: ['This field is required.'] for field in ('username', 'password') if not data.get(field)}
+        if errors:
+            return json_response(errors, status=400)
+        user = await User.objects.select_related('auth_token').filter(username=data['username']).afirst()
+        try:
+            verified = await password_verifier.verify(user, data['password'])
+        except VerifierSaturated:
+            response = json_response({'non_field_errors': [self.saturated]}, status=429)
+            response['Retry-After'] = str(settings.LOGIN_RETRY_AFTER)
+            return response
+        if not verified:
+            return json_response({'non_field_errors': [self.invalid_credentials]}, status=400)
+        try:
+            token = user.auth_token
+        except Token.DoesNotExist:
+            token, created = await Token.objects.aget_or_create(user=user)
+        return json_response({
+            'token': token.key,
+            'url': reverse('user-detail', kwargs={'pk': user.username}, request=request),
+            'username': user.username,
+            'password': user.password,
+            'email': user.email,
+            'groups': [group.name async for group in user.groups.all()],
+            'avatar': str(user.avatar),
+            'avatar_variants': variant_urls(user.avatar_variants, request) if user.avatar else {},
+            'bio': user.bio,
+            'location': user.location,
+        })
@@ -0,0 +1,191 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from time import monotonic
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from rest_framework.authentication import TokenAuthentication, SessionAuthentication, BasicAuthentication
+from .routers import primary_reads
+
+
+class TokenCache:
+    """
+    Bounded LRU of the token keys recently verified against the
+    database, along with the user and token they resolved to. Entries
+    expire after ttl seconds, and are dropped as soon as their token
+    is deleted or rotated, or their user is stored again.
+
+    A lookup racing with an invalidation is not cached: every
+    invalidation bumps a generation that lookups compare against.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = Lock()
+        self.entries = OrderedDict()
+        self.keys_of = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < monotonic():
+                self.misses += 1
+                if entry is not None:
+                    self.discard(key)
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, credentials, generation):
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.discard(key)
+            self.entries[key] = (monotonic() + self.ttl, credentials)
+            self.keys_of.setdefault(credentials[0].pk, set()).add(key)
+            while len(self.entries) > self.maxsize:
+                self.discard(next(iter(self.entries)))
+                self.evictions += 1
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            user = entry[1][0].pk
+            self.keys_of.get(user, set()).discard(key)
+            if not self.keys_of.get(user):
+                self.keys_of.pop(user, None)
+
+    def invalidate(self, key=None, user=None):
+        with self.lock:
+            self.generation += 1
+            keys = set(self.keys_of.get(user, ())) if user is not None else set()
+            for cached in keys | ({key} - {None}):
+                self.discard(cached)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.keys_of.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
+
+class PrimaryReadsAuthentication:
+    """
+    Authentication reading credentials from the primary only: a
+    replica lagging behind would still accept revoked ones.
+    """
+
+    def authenticate(self, request):
+        with primary_reads():
+            return super().authenticate(request)
+
+
+class PrimarySessionAuthentication(PrimaryReadsAuthentication, SessionAuthentication):
+    pass
+
+
+class PrimaryBasicAuthentication(PrimaryReadsAuthentication, BasicAuthentication):
+    pass
+
+
+class CachedTokenAuthentication(PrimaryReadsAuthentication, TokenAuthentication):
+    """
+    Token authentication serving recently verified tokens from
+    token_cache, so that authenticated requests do not query the
+    token and user tables each.
+    """
+
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is not None:
+            return credentials
+        generation = token_cache.generation
+        credentials = super().authenticate_credentials(key)
+        token_cache.put(key, credentials, generation)
+        return credentials
+
+
+class VerifierSaturated(Exception):
+    pass
+
+
+class PasswordVerifier:
+    """
+    Bounded pool checking passwords away from the event loop. At most
+    workers hashes are computed at once and at most backlog more wait
+    for a worker: past that, verify raises VerifierSaturated right
+    away, so that a burst of logins is shed instead of queueing
+    until every request times out.
+    """
+
+    def __init__(self, workers, backlog):
+        self.workers = workers
+        self.backlog = backlog
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-verifier')
+        self.slots = BoundedSemaphore(workers + backlog)
+        self.lock = Lock()
+        self.pending = 0
+        self.verified = 0
+        self.rejected = 0
+
+    async def verify(self, user, password):
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.rejected += 1
+            raise VerifierSaturated()
+        with self.lock:
+            self.pending += 1
+        future = self.executor.submit(self.check, user, password)
+        # The slot is held until the hash is computed, even if the client gave up
+        future.add_done_callback(self.release)
+        return await asyncio.wrap_future(future)
+
+    def release(self, future):
+        with self.lock:
+            self.pending -= 1
+            self.verified += 1
+        self.slots.release()
+
+    @staticmethod
+    def check(user, password):
+        if user is None or not user.is_active:
+            # Hash anyway, not to tell unknown users apart by response time
+            make_password(password)
+            return False
+        return user.check_password(password)
+
+    def metrics(self):
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'backlog': self.backlog,
+                'pending': self.pending,
+                'verified': self.verified,
+                'rejected': self.rejected,
+            }
+
+
+password_verifier = PasswordVerifier(settings.LOGIN_VERIFY_WORKERS, settings.LOGIN_VERIFY_BACKLOG)
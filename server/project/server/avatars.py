@@ -0,0 +1,72 @@
+import hashlib
+import posixpath
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+def variant_name(name, variant, content):
+    """
+    Returns the name of the given variant of an avatar, stored next
+    to the original and named after its own content: the small variant
+    of users/avatars/2024/01/31/me.jpg is e.g. stored in
+    users/avatars/2024/01/31/me.small.3f2a9c1b04d7.jpg. A variant
+    generated again with different bytes gets a new name, so that
+    it can be cached for good. Variants keep PNG originals as PNG,
+    every other format becomes JPEG.
+    """
+    stem, ext = posixpath.splitext(name)
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    return f'{stem}.{variant}.{digest}{".png" if ext.lower() == ".png" else ".jpg"}'
+
+
+def is_variant_of(name, variant, target):
+    return target.startswith(f'{posixpath.splitext(name)[0]}.{variant}.')
+
+
+def generate_variants(name, storage=default_storage, stored=None, force=False):
+    """
+    Generates the thumbnails of the avatar with the given name,
+    cropped around the centre and resized with Lanczos filtering.
+    The variants already stored, whose names are given, are kept
+    unless force is given. Returns the names of the variants of the
+    avatar, by variant, none if the original is missing, truncated
+    or is not an image.
+    """
+    stored = {variant: target for variant, target in (stored or {}).items()
+              if variant in settings.AVATAR_VARIANTS and is_variant_of(name, variant, target)}
+    missing = [variant for variant in settings.AVATAR_VARIANTS
+               if force or variant not in stored or not storage.exists(stored[variant])]
+    if not missing:
+        return stored
+    try:
+        with storage.open(name, 'rb') as original:
+            image = ImageOps.exif_transpose(Image.open(original))
+            image.load()
+    except (OSError, Image.DecompressionBombError):
+        return {}
+    for variant in missing:
+        side = settings.AVATAR_VARIANTS[variant]
+        thumbnail = ImageOps.fit(image, (side, side), method=Image.LANCZOS)
+        content = BytesIO()
+        if posixpath.splitext(name)[1].lower() == '.png':
+            thumbnail.save(content, format='PNG', optimize=True)
+        else:
+            thumbnail.convert('RGB').save(content, format='JPEG', quality=85, optimize=True, progressive=True)
+        target = variant_name(name, variant, content.getvalue())
+        # The same name holds the same bytes
+        stored[variant] = target if storage.exists(target) else storage.save(target, ContentFile(content.getvalue()))
+    return {variant: stored[variant] for variant in settings.AVATAR_VARIANTS}
+
+
+def variant_urls(names, request=None):
+    """
+    Returns the URL of each of the variants with the given names, as
+    stored on their user, absolute when a request is given.
+    """
+    urls = {variant: default_storage.url(target) for variant, target in names.items()}
+    if request is not None:
+        urls = {variant: request.build_absolute_uri(url) for variant, url in urls.items()}
+    return urls
@@ -0,0 +1,44 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend accepting the "init_command" and "transaction_mode"
+    options, which the bundled backend only supports from Django 5.1.
+
+    The statements of init_command, separated by semicolons, are run
+    on every new connection, which is where per-connection pragmas
+    such as the busy timeout or the cache size must be set. With
+    transaction_mode set to IMMEDIATE, atomic blocks take the write
+    lock as soon as they begin: concurrent writers then wait for each
+    other on the busy timeout, rather than failing with "database is
+    locked" when a read lock cannot be upgraded.
+    """
+
+    transaction_modes = frozenset(['DEFERRED', 'IMMEDIATE', 'EXCLUSIVE'])
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.init_command = params.pop('init_command', None)
+        transaction_mode = params.pop('transaction_mode', None)
+        if transaction_mode is not None and transaction_mode.upper() not in self.transaction_modes:
+            raise ImproperlyConfigured(
+                f"settings.DATABASES['{self.alias}']['OPTIONS']['transaction_mode'] "
+                f"must be one of {', '.join(sorted(self.transaction_modes))}"
+            )
+        self.transaction_mode = transaction_mode.upper() if transaction_mode is not None else None
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if self.init_command:
+            for statement in self.init_command.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            return super()._start_transaction_under_autocommit()
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
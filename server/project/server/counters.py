@@ -0,0 +1,88 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Shop, FidelityProgram, Catalogue, Product
+
+
+class RelationCounter:
+    """
+    Count of the related rows pointing to each instance of a model
+    through the fk field, stored on the model in the given field.
+    Rows of a many-to-many table also point to the other side of the
+    relationship, through the other_fk field.
+
+    Counts are refreshed with a single UPDATE recomputing them from
+    the related table, rather than incremented, so that concurrent
+    or repeated changes cannot make them drift.
+    """
+
+    def __init__(self, model, field, related, fk, other_fk=None):
+        self.model = model
+        self.field = field
+        self.related = related
+        self.fk = fk
+        self.other_fk = other_fk
+
+    def counted(self):
+        related = (self.related._default_manager.filter(**{self.fk: OuterRef('pk')})
+                   .order_by().values(self.fk).annotate(count=Count('*')).values('count'))
+        return Coalesce(Subquery(related), 0)
+
+    def refresh(self, pks=None, using=DEFAULT_DB_ALIAS):
+        """
+        Recomputes the count of the instances with the given primary
+        keys, of every instance if none are given. Returns the
+        number of instances refreshed.
+        """
+        instances = self.model._default_manager.using(using)
+        if pks is not None:
+            pks = set(pks) - {None}
+            if not pks:
+                return 0
+            instances = instances.filter(pk__in=pks)
+        return instances.update(**{self.field: self.counted()})
+
+    def drifted(self, using=DEFAULT_DB_ALIAS):
+        """
+        Returns the instances whose stored count differs from the
+        count of their related rows.
+        """
+        return (self.model._default_manager.using(using)
+                .alias(actual=self.counted()).exclude(**{self.field: F('actual')}))
+
+    def reload(self, instance, using=DEFAULT_DB_ALIAS):
+        # Keeps an instance in memory up to date with its refreshed count
+        count = (self.model._default_manager.using(using).filter(pk=instance.pk)
+                 .values_list(self.field, flat=True).first())
+        if count is not None:
+            setattr(instance, self.field, count)
+
+    def target_of(self, instance):
+        return getattr(instance, f'{self.fk}_id')
+
+    def targets_related_to(self, pk, using=DEFAULT_DB_ALIAS):
+        # Instances related to the one on the other side of a many-to-many relationship
+        return set(self.related._default_manager.using(using).filter(**{self.other_fk: pk})
+                   .values_list(f'{self.fk}_id', flat=True))
+
+
+# Counters by the model their related rows are stored in
+COUNTERS = {
+    counter.related: counter for counter in [
+        RelationCounter(FidelityProgram, 'shop_count', FidelityProgram.shop_list.through, 'fidelityprogram', 'shop'),
+        RelationCounter(FidelityProgram, 'member_count', Catalogue, 'fidelity_program'),
+        RelationCounter(Shop, 'employee_count', Shop.employees.through, 'shop', 'user'),
+        RelationCounter(Shop, 'product_count', Product, 'shop'),
+        RelationCounter(Product, 'owner_count', Product.owning_users.through, 'product', 'user'),
+    ]
+}
+
+
+def refresh_counts(instance, using=DEFAULT_DB_ALIAS):
+    """
+    Recomputes every count stored on the given instance with a single
+    UPDATE, e.g. once it is saved with the counts it had in memory.
+    """
+    counted = {counter.field: counter.counted() for counter in COUNTERS.values()
+               if isinstance(instance, counter.model)}
+    type(instance)._default_manager.using(using).filter(pk=instance.pk).update(**counted)
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from .models import User, FidelityProgram, Catalogue, Product, Transaction, preloaded_programs
+from .modelvalidators import UserSerializer, FidelityProgramSerializer, ProductSerializer, TransactionSerializer
+
+
+def dashboard_version_key(username):
+    return f'dashboard-version:{username}'
+
+
+def invalidate_dashboard(username):
+    """
+    Discards every cached dashboard summary of the given
+    user, by bumping the version their cache keys embed.
+    """
+    if username is None:
+        return
+    try:
+        cache.incr(dashboard_version_key(username))
+    except ValueError:
+        cache.set(dashboard_version_key(username), 1, timeout=None)
+
+
+def dashboard_cache_key(username, transactions, host):
+    version = cache.get_or_set(dashboard_version_key(username), 0, timeout=None)
+    return f'dashboard:{username}:{version}:{transactions}:{host}'
+
+
+def build_dashboard(user: User, request, transactions: int) -> dict:
+    """
+    Gathers in a fixed number of queries everything the customer
+    dashboard shows: the user profile, the joined fidelity programs
+    with their balance and affordable prizes, the owned prizes and
+    the last transactions of the user.
+    """
+    context = {'request': request}
+    transaction_ids = list(Transaction.objects.filter(user=user)
+                           .order_by('-executed_at').values_list('id', flat=True)[:transactions])
+    programs = FidelityProgram.objects.filter(
+        Q(catalogue_fidelity_program__customer=user) |
+        Q(product_fidelity_program__owning_users=user) |
+        Q(product_fidelity_program__transaction__in=transaction_ids)
+    ).distinct().prefetch_related('shop_list')
+    with preloaded_programs(programs):
+        programs = {program.pk: program for program in programs}
+        catalogue = [cat for cat in Catalogue.objects.filter(customer=user)
+                     if cat.fidelity_program_id in programs]
+        prizes = {}
+        for prize in Product.redeemable_by(user.username).prefetch_related('owning_users').order_by('value'):
+            prizes.setdefault(prize.fidelity_program_id, []).append(prize)
+        owned_prizes = list(Product.objects.filter(owning_users=user).prefetch_related('owning_users').order_by('id'))
+        last_transactions = list(Transaction.objects.filter(id__in=transaction_ids)
+                                 .prefetch_related('shopping_cart').order_by('-executed_at'))
+    return {
+        'user': UserSerializer(user, context=context).data,
+        'programs': [
+            {
+                'catalogue': cat.id,
+                'points': cat.points,
+                'fidelity_program': FidelityProgramSerializer(
+                    programs[cat.fidelity_program_id], context=context).data,
+                'affordable_prizes': ProductSerializer(
+                    prizes.get(cat.fidelity_program_id, []), many=True, context=context).data,
+            }
+            for cat in sorted(catalogue, key=lambda cat: cat.fidelity_program_id)
+        ],
+        'owned_prizes': ProductSerializer(owned_prizes, many=True, context=context).data,
+        'transactions': TransactionSerializer(last_transactions, many=True, context=context).data,
+    }
+
+
+def get_dashboard(user: User, request, transactions: int) -> dict:
+    """
+    Returns the dashboard summary of the given user, serving
+    it from the cache when nothing changed since it was built.
+    """
+    key = dashboard_cache_key(user.username, transactions, request.get_host())
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_dashboard(user, request, transactions)
+        cache.set(key, summary, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+    return summary
@@ -0,0 +1,135 @@
+from functools import lru_cache
+from django.core import checks
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import BooleanField, UniqueConstraint
+from django.urls import URLResolver, get_resolver
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import BooleanField as BooleanSerializerField
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+@lru_cache(maxsize=None)
+def indexed_fields(model):
+    """
+    Returns the names of the model fields leading at least
+    one database index, so that filtering or ordering on
+    them never needs a full table scan.
+    """
+    opts = model._meta
+    fields = {field.name for field in opts.concrete_fields
+              if field.primary_key or field.unique or field.db_index}
+    fields.update(index.fields[0].lstrip('-') for index in opts.indexes)
+    fields.update(constraint.fields[0] for constraint in opts.constraints
+                  if isinstance(constraint, UniqueConstraint) and constraint.fields)
+    return frozenset(fields)
+
+
+def unindexed_fields(model, lookups):
+    """
+    Returns the names of the fields targeted by the given lookups
+    or orderings which lead no database index.
+    """
+    fields = (lookup.lstrip('-').split('__')[0] for lookup in lookups)
+    return [field_name for field_name in dict.fromkeys(fields) if field_name not in indexed_fields(model)]
+
+
+def check_indexed(view):
+    """
+    Returns the errors of the given view filtering or ordering on
+    fields which are not indexed, through the backends below.
+    """
+    queryset = getattr(view, 'queryset', None)
+    if queryset is None:
+        return []
+    backends = getattr(view, 'filter_backends', [])
+    lookups = []
+    if any(issubclass(backend, IndexedFilterBackend) for backend in backends):
+        lookups += getattr(view, 'filter_fields', {}).values()
+    if any(issubclass(backend, IndexedOrderingFilter) for backend in backends):
+        for ordering in (getattr(view, 'ordering_fields', None), getattr(view, 'ordering', None)):
+            if isinstance(ordering, str):
+                ordering = [] if ordering == '__all__' else [ordering]
+            lookups += ordering or []
+    return [
+        checks.Error(
+            f'{queryset.model.__name__}.{field_name} is not indexed and cannot be used to filter or order',
+            obj=view,
+            id='server.E001',
+        )
+        for field_name in unindexed_fields(queryset.model, lookups)
+    ]
+
+
+def check_indexed_views(app_configs=None, **kwargs):
+    """
+    System check of the filters and orderings of every view routed
+    by the URLconf, run at startup rather than on the first request.
+    """
+    views, resolvers = {}, [get_resolver()]
+    while resolvers:
+        for pattern in resolvers.pop().url_patterns:
+            if isinstance(pattern, URLResolver):
+                resolvers.append(pattern)
+            elif hasattr(pattern.callback, 'cls'):
+                # Views of DRF, routed once per action or format suffix
+                views.setdefault(pattern.callback.cls)
+    return [error for view in views for error in check_indexed(view)]
+
+
+class IndexedFilterBackend(BaseFilterBackend):
+    """
+    Filters a queryset through the query string parameters
+    declared by the view filter_fields attribute, which maps
+    each parameter name to a field lookup. Every lookup must
+    target an indexed field, as a system check makes sure of,
+    while undeclared parameters are ignored.
+    Parameters bound to an "in" lookup may be repeated.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        filters = {}
+        for param, lookup in getattr(view, 'filter_fields', {}).items():
+            if param not in request.query_params:
+                continue
+            field = queryset.model._meta.get_field(lookup.split('__')[0])
+            if lookup.endswith('__in'):
+                filters[lookup] = [self.to_python(field, param, value)
+                                   for value in request.query_params.getlist(param)]
+            else:
+                filters[lookup] = self.to_python(field, param, request.query_params[param])
+        return queryset.filter(**filters)
+
+    def to_python(self, field, param, value):
+        try:
+            if isinstance(field, BooleanField):
+                # Accept the same spellings as boolean serializer fields, e.g. 'true' or 'false'
+                value = BooleanSerializerField().to_internal_value(value)
+            return field.to_python(value)
+        except DjangoValidationError as ex:
+            raise ValidationError({param: ex.messages})
+        except ValidationError as ex:
+            raise ValidationError({param: ex.detail})
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': param,
+                'required': False,
+                'in': 'query',
+                'description': f'Filter on {lookup}',
+                'schema': {'type': 'string'},
+            }
+            for param, lookup in getattr(view, 'filter_fields', {}).items()
+        ]
+
+
+class IndexedOrderingFilter(OrderingFilter):
+    """
+    Ordering filter accepting only the indexed fields
+    listed by the view ordering_fields attribute.
+    """
+
+    def get_valid_fields(self, queryset, view, context={}):
+        valid_fields = super().get_valid_fields(queryset, view, context)
+        indexed = indexed_fields(queryset.model)
+        return [(field, label) for field, label in valid_fields if field.split('__')[0] in indexed]
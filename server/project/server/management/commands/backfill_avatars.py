@@ -0,0 +1,46 @@
+import os
+from itertools import islice
+from multiprocessing import Pool
+import django
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from server.avatars import generate_variants
+from server.models import User
+
+
+def backfill(task):
+    name, stored, force = task
+    try:
+        return name, stored, generate_variants(name, stored=stored, force=force), None
+    except Exception as ex:
+        return name, stored, stored, ex
+
+
+class Command(BaseCommand):
+    help = 'Generates the missing thumbnail variants of the avatars stored before they were introduced'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=2000, help='Avatars read from the database at once')
+        parser.add_argument('--chunk-size', type=int, default=50, help='Avatars handed to a process at once')
+        parser.add_argument('--force', action='store_true', help='Regenerate the variants already stored')
+
+    def handle(self, *args, **options):
+        avatars = variants = failures = 0
+        # The pool is started before any query, not to share the connection with the processes
+        with Pool(options['processes'], initializer=django.setup) as pool:
+            users = User.objects.using(options['database']).exclude(avatar='')
+            avatars_stored = users.values_list('avatar', 'avatar_variants').order_by().iterator()
+            while batch := dict(islice(avatars_stored, options['batch_size'])):
+                tasks = ((name, stored, options['force']) for name, stored in batch.items())
+                for name, stored, generated, error in pool.imap_unordered(backfill, tasks, options['chunk_size']):
+                    avatars += 1
+                    variants += sum(1 for variant, target in generated.items() if stored.get(variant) != target)
+                    if generated != stored:
+                        users.filter(avatar=name).update(avatar_variants=generated)
+                    if error is not None:
+                        failures += 1
+                        self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {variants} variants of {avatars} avatars, {failures} failed'))
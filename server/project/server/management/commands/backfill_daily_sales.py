@@ -0,0 +1,56 @@
+import os
+from contextlib import nullcontext
+from datetime import timedelta
+from multiprocessing import Pool
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from server.models import Transaction
+from server.rollups import aggregate_daily_sales, replace_daily_sales
+
+
+def aggregate(chunk):
+    start, end, using = chunk
+    return start, end, aggregate_daily_sales(start, end, using)
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the daily sales of every shop from the stored transactions, a chunk of days at a time, '
+            'aggregating chunks in parallel')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--start', type=parse_date, help='First day, the one of the first transaction by default')
+        parser.add_argument('--end', type=parse_date,
+                            help='Last day, yesterday by default: the days still open are kept up to date by '
+                                 'settlement, and recomputing them could miss the transactions being settled')
+        parser.add_argument('--chunk-days', type=int, default=7, help='Days aggregated at once')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if options['chunk_days'] < 1:
+            raise CommandError('At least a day per chunk is required')
+        days = 0
+        # The pool is started before any query, not to share the connection with the processes
+        pool = Pool(options['processes'], initializer=django.setup) if options['processes'] > 1 else None
+        with pool or nullcontext():
+            first = Transaction.objects.using(using).aggregate(first=Min('executed_at'))['first']
+            start = options['start'] or (timezone.localdate(first) if first else None)
+            end = options['end'] or timezone.localdate() - timedelta(days=1)
+            if start is None or start > end:
+                self.stdout.write(self.style.SUCCESS('No days to backfill'))
+                return
+            chunks = []
+            while start <= end:
+                chunks.append((start, min(start + timedelta(days=options['chunk_days'] - 1), end), using))
+                start += timedelta(days=options['chunk_days'])
+            for chunk_start, chunk_end, rows in (pool.imap_unordered(aggregate, chunks) if pool
+                                                 else map(aggregate, chunks)):
+                replace_daily_sales(rows, chunk_start, chunk_end, using)
+                days += (chunk_end - chunk_start).days + 1
+        self.stdout.write(self.style.SUCCESS(f'Backfilled the daily sales of {days} days'))
+
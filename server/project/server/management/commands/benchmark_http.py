@@ -0,0 +1,77 @@
+import asyncio
+import itertools
+import time
+from statistics import quantiles
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+HOT_READ_PATHS = [
+    '/shops/',
+    '/fidelityprograms/',
+    '/product/',
+    '/catalogue/byuser/Claudio91/',
+    '/catalogue/available_prizes/Claudio91/',
+]
+
+
+class Command(BaseCommand):
+    help = ('Measures throughput, latency and failures of a running server as the number of '
+            'concurrent clients grows, e.g. to compare the WSGI and the ASGI servers')
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Base URL of the server, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--paths', nargs='+', default=HOT_READ_PATHS)
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[10, 50, 200])
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds each concurrency level is run for')
+        parser.add_argument('--timeout', type=float, default=10.0, help='Seconds after which a request fails')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('An http:// URL is required')
+        self.stdout.write(f"{'clients':>8}{'requests/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'failures':>10}")
+        for concurrency in options['concurrency']:
+            latencies, failures = asyncio.run(self.run(url, concurrency, options))
+            p50, p99 = (quantiles(latencies, n=100)[i] * 1000 for i in (49, 98)) if len(latencies) > 1 else (0, 0)
+            self.stdout.write(f'{concurrency:>8}{len(latencies) / options["duration"]:>12.1f}'
+                              f'{p50:>10.0f}{p99:>10.0f}{failures:>10}')
+
+    async def run(self, url, concurrency, options):
+        """
+        Keeps the given number of clients sending requests, each on
+        a new connection, for the configured duration. Returns the
+        latency of every successful request and the failure count.
+        """
+        deadline = time.monotonic() + options['duration']
+        paths = itertools.cycle(options['paths'])
+        latencies = []
+        failures = 0
+
+        async def client():
+            nonlocal failures
+            while time.monotonic() < deadline:
+                start = time.monotonic()
+                try:
+                    status = await asyncio.wait_for(self.get(url, next(paths)), options['timeout'])
+                except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                    status = None
+                if status == 200:
+                    latencies.append(time.monotonic() - start)
+                else:
+                    failures += 1
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return latencies, failures
+
+    @staticmethod
+    async def get(url, path):
+        reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+        try:
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\nAccept: application/json\r\n'
+                         f'Connection: close\r\n\r\n'.encode())
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
@@ -0,0 +1,116 @@
+import random
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+BENCHMARK_ALIAS = 'sqlite_benchmark'
+
+
+class Command(BaseCommand):
+    help = ('Measures read and write throughput of concurrent connections on a scratch SQLite '
+            'database, with the default SQLite settings and with the configured profile')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Alias whose settings make up the configured profile')
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds each profile is run for')
+        parser.add_argument('--accounts', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        configured = connections[options['database']].settings_dict
+        if connections[options['database']].vendor != 'sqlite':
+            self.stderr.write(self.style.ERROR(f"Database '{options['database']}' is not a SQLite database"))
+            return
+        profiles = {
+            'default': {**configured, 'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {}},
+            'configured': configured,
+        }
+        self.stdout.write(f"{'profile':<12}{'reads/s':>12}{'writes/s':>12}{'failed writes':>16}")
+        for name, settings_dict in profiles.items():
+            reads, writes, failures = self.run_profile(settings_dict, options)
+            self.stdout.write(f'{name:<12}{reads / options["duration"]:>12.0f}'
+                              f'{writes / options["duration"]:>12.0f}{failures:>16}')
+
+    def run_profile(self, settings_dict, options):
+        """
+        Runs readers and writers against a fresh database opened with
+        the given settings. Writers settle movements on random accounts,
+        reading and then updating a balance in one transaction as the
+        settlement of a purchase does; readers look balances and the
+        movements of accounts up. Returns the number of completed
+        reads and writes, along with the number of failed writes.
+        """
+        directory = tempfile.mkdtemp(prefix='benchmark_sqlite')
+        connections.settings[BENCHMARK_ALIAS] = {**settings_dict, 'NAME': str(Path(directory) / 'benchmark.sqlite3')}
+        try:
+            self.populate(options['accounts'])
+            stop = threading.Event()
+            counters = {'reads': 0, 'writes': 0, 'failures': 0}
+            lock = threading.Lock()
+            workers = [threading.Thread(target=self.work, args=(self.read, options, stop, counters, lock))
+                       for _ in range(options['readers'])]
+            workers += [threading.Thread(target=self.work, args=(self.write, options, stop, counters, lock))
+                        for _ in range(options['writers'])]
+            for worker in workers:
+                worker.start()
+            time.sleep(options['duration'])
+            stop.set()
+            for worker in workers:
+                worker.join()
+            return counters['reads'], counters['writes'], counters['failures']
+        finally:
+            connections[BENCHMARK_ALIAS].close()
+            del connections[BENCHMARK_ALIAS]
+            del connections.settings[BENCHMARK_ALIAS]
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def populate(self, accounts):
+        with transaction.atomic(using=BENCHMARK_ALIAS), connections[BENCHMARK_ALIAS].cursor() as cursor:
+            cursor.execute('CREATE TABLE account (id INTEGER PRIMARY KEY, points REAL NOT NULL)')
+            cursor.execute('CREATE TABLE movement (id INTEGER PRIMARY KEY, '
+                           'account_id INTEGER NOT NULL REFERENCES account (id), points REAL NOT NULL)')
+            cursor.execute('CREATE INDEX movement_account_idx ON movement (account_id)')
+            cursor.executemany('INSERT INTO account (id, points) VALUES (%s, %s)',
+                               [(account, 0.0) for account in range(1, accounts + 1)])
+
+    @staticmethod
+    def work(operation, options, stop, counters, lock):
+        # Each thread gets its own connection to the benchmark database
+        done = failed = 0
+        try:
+            while not stop.is_set():
+                try:
+                    operation(random.randint(1, options['accounts']))
+                    done += 1
+                except OperationalError:
+                    failed += 1
+        finally:
+            connections[BENCHMARK_ALIAS].close()
+            with lock:
+                if operation.__name__ == 'read':
+                    counters['reads'] += done
+                else:
+                    counters['writes'] += done
+                    counters['failures'] += failed
+
+    @staticmethod
+    def read(account):
+        with connections[BENCHMARK_ALIAS].cursor() as cursor:
+            cursor.execute('SELECT points FROM account WHERE id = %s', [account])
+            cursor.fetchone()
+            cursor.execute('SELECT COUNT(*), SUM(points) FROM movement WHERE account_id = %s', [account])
+            cursor.fetchone()
+
+    @staticmethod
+    def write(account):
+        with transaction.atomic(using=BENCHMARK_ALIAS), connections[BENCHMARK_ALIAS].cursor() as cursor:
+            cursor.execute('SELECT points FROM account WHERE id = %s', [account])
+            points = random.randint(1, 100)
+            cursor.execute('UPDATE account SET points = %s WHERE id = %s', [cursor.fetchone()[0] + points, account])
+            cursor.execute('INSERT INTO movement (account_id, points) VALUES (%s, %s)', [account, points])
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from server.schema import code_version, generate_schema, schema_artifact_path
+
+
+class Command(BaseCommand):
+    help = 'Generates the OpenAPI schema artifact of the current code version, unless it already exists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Generate the artifact even if it exists')
+
+    def handle(self, *args, **options):
+        version = code_version()
+        path = schema_artifact_path(version)
+        if path.exists() and not options['force']:
+            self.stdout.write(f'Schema of version {version} is up to date at {path}')
+            return
+        path = generate_schema(version)
+        self.stdout.write(self.style.SUCCESS(f'Generated schema of version {version} at {path}'))
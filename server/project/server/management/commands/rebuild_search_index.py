@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from server.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index over shops, products and fidelity programs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic(using=options['database']):
+            indexed = rebuild_search_index(using=options['database'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} documents'))
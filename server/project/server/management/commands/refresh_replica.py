@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = 'Copies the SQLite primary database over the SQLite read replica, once or periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--replica', default=settings.READ_REPLICA_DATABASE)
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep refreshing the replica every READ_REPLICA_REFRESH_INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        if options['replica'] not in connections:
+            raise CommandError(f"Database '{options['replica']}' is not configured")
+        for alias in (options['database'], options['replica']):
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f"Database '{alias}' is not a SQLite database")
+        primary = str(connections[options['database']].settings_dict['NAME'])
+        replica = str(connections[options['replica']].settings_dict['NAME'])
+        while True:
+            self.refresh(primary, replica)
+            if not options['watch']:
+                break
+            time.sleep(settings.READ_REPLICA_REFRESH_INTERVAL)
+        self.stdout.write(self.style.SUCCESS(f'Copied {primary} to {replica}'))
+
+    @staticmethod
+    def refresh(primary, replica):
+        """
+        Takes a consistent snapshot of the primary through the online
+        backup API, then swaps it in place of the replica: connections
+        already open keep reading the previous copy until they close.
+        """
+        copy = f'{replica}.refresh'
+        with closing(sqlite3.connect(primary)) as source, closing(sqlite3.connect(copy)) as target:
+            source.backup(target)
+            # A WAL copy could pick up the write-ahead log of the replica it replaces
+            target.execute('PRAGMA journal_mode=DELETE')
+        os.replace(copy, replica)
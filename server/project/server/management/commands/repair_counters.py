@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from server.counters import COUNTERS
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the denormalized relationship counts of shops, fidelity programs and products, '
+            'e.g. after bulk imports or queryset updates that bypass the signals maintaining them')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted counts without repairing them')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        with transaction.atomic(using=using):
+            for counter in COUNTERS.values():
+                drifted = counter.drifted(using=using).count()
+                if drifted and not options['dry_run']:
+                    counter.refresh(using=using)
+                self.stdout.write(f'{counter.model._meta.object_name}.{counter.field}: {drifted} drifted')
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Counters repaired'))
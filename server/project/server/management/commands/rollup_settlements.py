@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from server.rollups import settlement_rollup, backfill_settled_products
+
+
+class Command(BaseCommand):
+    help = ('Rolls up the points issued and redeemed by fidelity program, issuing shop, redeeming shop and day, '
+            'from the transactions stored since the last run')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Transactions aggregated at once')
+        parser.add_argument('--rebuild', action='store_true', help='Discard the rollup and aggregate every transaction')
+        parser.add_argument('--backfill', action='store_true',
+                            help='First record the settled products of transactions stored without, e.g. from fixtures')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            recorded = backfill_settled_products(using=options['database'])
+            self.stdout.write(f'Recorded the settled products of {recorded} transactions')
+        run = settlement_rollup.rebuild if options['rebuild'] else settlement_rollup.run
+        start, end = run(options['batch_size'], using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Rolled up transactions {start + 1} to {end}' if end > start
+                                             else 'Rollup already up to date'))
@@ -0,0 +1,48 @@
+import calendar
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from server.models import FidelityProgram
+from server.rollups import settlement_rollup, settlement_report
+
+
+class Command(BaseCommand):
+    help = ('Reports the points each shop of a coalition program issued and redeemed in a month, '
+            'and how many of them the other shops redeemed, from the settlement rollup')
+
+    def add_arguments(self, parser):
+        parser.add_argument('program', help='Name of the coalition fidelity program')
+        parser.add_argument('--month', help='Month reported, as YYYY-MM, the current one by default')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        try:
+            program = FidelityProgram.objects.using(using).get(pk=options['program'])
+        except FidelityProgram.DoesNotExist:
+            raise CommandError(f'No fidelity program named {options["program"]}')
+        if not program.is_coalition():
+            raise CommandError(f'{program.name} is not a coalition program')
+        try:
+            year, month = (map(int, options['month'].split('-')) if options['month']
+                           else timezone.localdate().timetuple()[:2])
+            start, end = date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+        except ValueError:
+            raise CommandError('The month should be given as YYYY-MM')
+        settlement_rollup.run(using=using)
+        rows = settlement_report(program, start, end, using=using)
+        self.stdout.write(f"{'issuing shop':<32}{'redeeming shop':<32}{'issued':>12}{'redeemed':>12}")
+        for row in rows:
+            self.stdout.write(f"{row['issuing_shop_id']:<32}{row['redeeming_shop_id']:<32}"
+                              f"{row['points_issued']:>12.2f}{row['points_redeemed']:>12.2f}")
+        # Points of other shops each shop redeemed, less its own points redeemed elsewhere: owed to it if positive
+        balances = {}
+        for row in rows:
+            if row['issuing_shop_id'] != row['redeeming_shop_id']:
+                balances[row['issuing_shop_id']] = balances.get(row['issuing_shop_id'], 0.0) - row['points_redeemed']
+                balances[row['redeeming_shop_id']] = (balances.get(row['redeeming_shop_id'], 0.0)
+                                                      + row['points_redeemed'])
+        self.stdout.write(f"\n{'shop':<32}{'balance':>12}")
+        for shop, balance in sorted(balances.items()):
+            self.stdout.write(f'{shop:<32}{balance:>12.2f}')
@@ -1,6 +1,33 @@
-from django.db import models
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import models, transaction as db_transaction
+from django.dispatch import Signal
 from django.contrib.auth.models import AbstractUser
 
+# Context rather than thread local, so that the async ORM sees it from
+# the thread it runs queries in.
+_preloaded_programs = ContextVar('preloaded_programs', default=None)
+
+# Sent by Catalogue.update_points with the customer and fidelity
+# program primary keys, along with the previous and the new balance.
+points_changed = Signal()
+
+
+@contextmanager
+def preloaded_programs(programs):
+    """
+    Makes the given FidelityProgram instances, whose shop list
+    should be prefetched, available to every Product instance
+    built inside the block, which then checks its program and
+    shop coherence without querying the database.
+    """
+    previous = _preloaded_programs.get()
+    token = _preloaded_programs.set({**(previous or {}), **{program.pk: program for program in programs}})
+    try:
+        yield
+    finally:
+        _preloaded_programs.reset(token)
+
 
 class User(AbstractUser):
     """
@@ -17,12 +44,17 @@ class User(AbstractUser):
         upload_to='users/avatars/%Y/%m/%d',
         default='users/avatars/default.jpg',
     )
+    # Names of the thumbnails generated from the avatar, by variant
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(max_length=500, null=True)
     location = models.CharField(max_length=30, null=True)
 
     class Meta:
         verbose_name = 'user'
         verbose_name_plural = '1. Users'
+        indexes = [
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
 
     def __str__(self):
         return self.username
@@ -48,6 +80,10 @@ class Shop(models.Model):
     owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='shop_owner')
     employees = models.ManyToManyField(User, blank=True)
 
+    # Denormalized relationship counts, maintained by server.counters
+    employee_count = models.PositiveIntegerField(default=0, editable=False)
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name = 'shop'
         verbose_name_plural = '2. Shops'
@@ -81,12 +117,16 @@ class FidelityProgram(models.Model):
     points_coefficient = models.FloatField(default=0.5)
     prize_coefficient = models.FloatField(default=0.5)
 
+    # Denormalized relationship counts, maintained by server.counters
+    shop_count = models.PositiveIntegerField(default=0, editable=False)
+    member_count = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name = 'fidelityprogram'
         verbose_name_plural = '3. Fidelity Programs'
 
     def is_coalition(self):
-        return self.shop_list.all().count() > 1
+        return self.shop_count > 1
 
     def __str__(self):
         return '({name} , {prtype})'.format(name=self.name, prtype=self.program_type)
@@ -115,6 +155,10 @@ class Catalogue(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['customer', 'fidelity_program'], name='catalogue_key')
         ]
+        indexes = [
+            models.Index(fields=['points'], name='catalogue_points_idx'),
+            models.Index(fields=['fidelity_program', 'points'], name='catalogue_program_points_idx'),
+        ]
 
     @classmethod
     def update_points(cls, customer, fprogram, offset):
@@ -123,6 +167,13 @@ class Catalogue(models.Model):
             new_points = (prev_points + offset) if (prev_points + offset > 0) else 0.0
             Catalogue.objects.filter(customer_id=customer).filter(fidelity_program_id=fprogram).update(
                 points=new_points)
+            points_changed.send(
+                sender=cls,
+                customer=getattr(customer, 'pk', customer),
+                fidelity_program=getattr(fprogram, 'pk', fprogram),
+                previous=prev_points,
+                current=new_points,
+            )
         return
 
     def __str__(self):
@@ -156,22 +207,55 @@ class Product(models.Model):
 
     owning_users = models.ManyToManyField(User, blank=True, related_name='owners')
 
+    # Denormalized relationship count, maintained by server.counters
+    owner_count = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name = 'product'
         verbose_name_plural = '5. Products'
         constraints = [
             models.UniqueConstraint(fields=['name', 'shop'], name='product_key')
         ]
+        indexes = [
+            models.Index(fields=['value'], name='product_value_idx'),
+            models.Index(fields=['is_persistent', 'value'], name='product_persistent_value_idx'),
+            models.Index(fields=['fidelity_program', 'is_persistent', 'value'], name='product_program_prize_idx'),
+            models.Index(fields=['shop', 'value'], name='product_shop_value_idx'),
+            models.Index(fields=['fidelity_program', 'value'], name='product_program_value_idx'),
+        ]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        program = self.get_fidelity_program()
         # if self.fidelity_program is not None and not self.shop.fidelity_program_set.exists():
-        if self.fidelity_program is not None and self.shop not in self.fidelity_program.shop_list.all():
-            self.fidelity_program = None
-        if self.fidelity_program is not None and self.points_coefficient is None:
-            self.points_coefficient = self.fidelity_program.points_coefficient
-        if self.fidelity_program is not None and self.prize_coefficient is None:
-            self.prize_coefficient = self.fidelity_program.prize_coefficient
+        if program is not None and self.shop_id not in [shop.pk for shop in program.shop_list.all()]:
+            self.fidelity_program = program = None
+        if program is not None and self.points_coefficient is None:
+            self.points_coefficient = program.points_coefficient
+        if program is not None and self.prize_coefficient is None:
+            self.prize_coefficient = program.prize_coefficient
+
+    def get_fidelity_program(self):
+        if self.fidelity_program_id is None:
+            return None
+        program = (_preloaded_programs.get() or {}).get(self.fidelity_program_id)
+        if program is not None:
+            self.fidelity_program = program
+            return program
+        return self.fidelity_program
+
+    @classmethod
+    def redeemable_by(cls, customer):
+        """
+        Returns the persistent prizes the given customer can afford
+        in every fidelity program they joined, joining their catalogue
+        balances against prize values in a single query.
+        """
+        return cls.objects.filter(
+            is_persistent=True,
+            fidelity_program__catalogue_fidelity_program__customer_id=customer,
+            value__lte=models.F('fidelity_program__catalogue_fidelity_program__points'),
+        )
 
     def compute_points_variation(self):
         # if self.value == 0.0:
@@ -223,17 +307,30 @@ class Transaction(models.Model):
     )
     shopping_cart = models.ManyToManyField(Product)
 
+    # Identifier given by the point of sale recording the transaction, so
+    # that uploading it again after a failure never stores it twice
+    reference = models.UUIDField(unique=True, null=True, blank=True)
+
     class Meta:
         verbose_name = 'transaction'
         verbose_name_plural = '6. Transactions'
+        indexes = [
+            models.Index(fields=['executed_at'], name='transaction_executed_at_idx'),
+            models.Index(fields=['total'], name='transaction_total_idx'),
+            models.Index(fields=['shop', 'executed_at'], name='transaction_shop_date_idx'),
+            models.Index(fields=['user', 'executed_at'], name='transaction_user_date_idx'),
+        ]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        if Transaction.objects.filter(id=self.id).count() == 0:
+        # Instances loaded from the database already own a primary key,
+        # only new ones are stored here to allow adding the shopping cart.
+        if self.id is None:
             super().save()
 
     def save(self, *args, **kwargs):
-        if self.shopping_cart.exists():
+        settled = self.shopping_cart.exists()
+        if settled:
             # if product is a non persistent prize available for this order only
             for product in self.shopping_cart.filter(is_persistent=False):
                 self.update_total(product.compute_value_variation())
@@ -252,6 +349,179 @@ class Transaction(models.Model):
         if self.total < 0:
             self.total = 0.0
         super(Transaction, self).save(*args, **kwargs)
+        if settled:
+            SettledProduct.record(self)
 
     def update_total(self, offset: float):
         self.total += offset
+
+
+class OutboxEvent(models.Model):
+    """
+    Event recorded by the platform for later delivery to
+    customers, e.g. when their balance in a fidelity program
+    reaches the value of a prize they could not afford before.
+    """
+    PRIZE_AFFORDABLE = 'PRIZE_AFFORDABLE'
+    EVENT_KIND_CHOICES = [
+        (PRIZE_AFFORDABLE, "Prize affordable"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=EVENT_KIND_CHOICES, default=PRIZE_AFFORDABLE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    balance = models.FloatField(default=0.0)
+
+    # Database relationships
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='outbox_customer')
+    fidelity_program = models.ForeignKey(
+        FidelityProgram,
+        on_delete=models.CASCADE,
+        related_name='outbox_fidelity_program'
+    )
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='outbox_product')
+
+    class Meta:
+        verbose_name = 'outboxevent'
+        verbose_name_plural = '7. Outbox events'
+        indexes = [
+            models.Index(fields=['dispatched_at', 'created_at'], name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return '({kind}, {csmr}, {prod})'.format(kind=self.kind, csmr=self.customer_id, prod=self.product_id)
+
+
+class RollupWatermark(models.Model):
+    """
+    High-water mark of a rollup: the primary key of the last
+    transaction it aggregated, so that the next run only reads
+    the transactions stored since.
+    """
+    name = models.CharField(max_length=30, primary_key=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'rollupwatermark'
+        verbose_name_plural = '8. Rollup watermarks'
+
+    def __str__(self):
+        return '({name}, {pos})'.format(name=self.name, pos=self.position)
+
+
+class SettlementRollup(models.Model):
+    """
+    Points moved in a fidelity program on a given day, by the shop
+    offering the products they were earned on or spent for (the
+    issuing shop) and by the shop the transactions took place in
+    (the redeeming shop). In a coalition program, the rows of two
+    different shops are what they settle with each other.
+    """
+    day = models.DateField()
+    points_issued = models.FloatField(default=0.0)
+    points_redeemed = models.FloatField(default=0.0)
+
+    # Database relationships
+    fidelity_program = models.ForeignKey(
+        FidelityProgram,
+        on_delete=models.CASCADE,
+        related_name='settlement_fidelity_program'
+    )
+    issuing_shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='settlement_issuing_shop')
+    redeeming_shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='settlement_redeeming_shop')
+
+    class Meta:
+        verbose_name = 'settlementrollup'
+        verbose_name_plural = '9. Settlement rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['fidelity_program', 'issuing_shop', 'redeeming_shop', 'day'],
+                                    name='settlement_rollup_key')
+        ]
+        indexes = [
+            models.Index(fields=['fidelity_program', 'day'], name='settlement_program_day_idx'),
+        ]
+
+    def __str__(self):
+        return '({program}, {issuer}, {redeemer}, {day})'.format(
+            program=self.fidelity_program_id,
+            issuer=self.issuing_shop_id,
+            redeemer=self.redeeming_shop_id,
+            day=self.day
+        )
+
+
+class ShopDailySales(models.Model):
+    """
+    Revenue and number of the transactions settled in a shop on a
+    given day, kept up to date as transactions are settled.
+    """
+    day = models.DateField()
+    revenue = models.FloatField(default=0.0)
+    transactions = models.PositiveIntegerField(default=0)
+
+    # Database relationships
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='daily_sales_shop')
+
+    class Meta:
+        verbose_name = 'shopdailysales'
+        verbose_name_plural = '10. Shop daily sales'
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'day'], name='shop_daily_sales_key')
+        ]
+
+    @property
+    def average_basket(self):
+        return self.revenue / self.transactions if self.transactions else 0.0
+
+    def __str__(self):
+        return '({shop}, {day}, {rev})'.format(shop=self.shop_id, day=self.day, rev=self.revenue)
+
+
+class SettledProduct(models.Model):
+    """
+    Product of the cart of a transaction, as it was when the transaction
+    was settled: the points it issued or redeemed, and the shop which
+    issued them, are kept whatever later happens to the product or to
+    its fidelity program.
+    """
+    points_issued = models.FloatField(default=0.0)
+    points_redeemed = models.FloatField(default=0.0)
+
+    # Database relationships
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='settled_products')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='settled_product')
+    fidelity_program = models.ForeignKey(
+        FidelityProgram,
+        on_delete=models.CASCADE,
+        related_name='settled_fidelity_program'
+    )
+    issuing_shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='settled_issuing_shop')
+
+    class Meta:
+        verbose_name = 'settledproduct'
+        verbose_name_plural = '11. Settled products'
+
+    @classmethod
+    def record(cls, settled: Transaction, using=None):
+        """
+        Records the products of the cart of the given transaction,
+        in place of the ones recorded when it was settled before.
+        Only products of a fidelity program move points.
+        """
+        using = using or settled._state.db
+        products = settled.shopping_cart.using(using).filter(fidelity_program__isnull=False) \
+            .select_related('fidelity_program')
+        lines = [
+            cls(transaction=settled, product=product, fidelity_program_id=product.fidelity_program_id,
+                issuing_shop_id=product.shop_id,
+                points_issued=0.0 if product.is_persistent else product.compute_points_variation(),
+                points_redeemed=product.value if product.is_persistent else 0.0)
+            for product in products
+        ]
+        with db_transaction.atomic(using=using):
+            cls.objects.using(using).filter(transaction=settled).delete()
+            cls.objects.using(using).bulk_create(lines)
+
+    def __str__(self):
+        return '({transaction}, {product})'.format(transaction=self.transaction_id, product=self.product_id)
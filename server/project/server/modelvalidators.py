@@ -1,20 +1,29 @@
 from django.contrib.auth.hashers import make_password
+from django.db import transaction as db_transaction
 from rest_framework import serializers
 from .models import User, Shop, FidelityProgram, Catalogue, Product, Transaction
+from .avatars import variant_urls
+from .rollups import record_sale
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
 
 class UserSerializer(serializers.HyperlinkedModelSerializer):
     """
     User serialization class for field validation purposes.
     """
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = ['url', 'username', 'password', 'email',
-                  'groups', 'phone', 'avatar', 'bio',
-                  'location']
+                  'groups', 'phone', 'avatar', 'avatar_variants',
+                  'bio', 'location']
         validate_password = make_password
 
+    def get_avatar_variants(self, user) -> dict:
+        if not user.avatar:
+            return {}
+        return variant_urls(user.avatar_variants, self.context.get('request'))
+
 class ShopSerializer(serializers.HyperlinkedModelSerializer):
     """
     Shop serialization class for field validation purposes.
@@ -177,15 +186,20 @@ class TransactionSerializer(serializers.HyperlinkedModelSerializer):
         model = Transaction
         fields = ['url', 'id', 'executed_at',
                   'user', 'shop', 'shopping_cart',
-                  'total']
+                  'total', 'reference']
         #extra_kwargs = {'shopping_cart': {'required': False}}
 
     def create(self, validated_data):
-        transaction = Transaction(
-            user=validated_data['user'],
-            shop=validated_data['shop'],
-        )
-        for prod in validated_data['shopping_cart']:
-            transaction.shopping_cart.add(prod)
-        transaction.save()
+        # Settlement reads and updates balances across several tables:
+        # a single transaction keeps them consistent under concurrency.
+        with db_transaction.atomic():
+            transaction = Transaction(
+                user=validated_data['user'],
+                shop=validated_data['shop'],
+                reference=validated_data.get('reference'),
+            )
+            for prod in validated_data['shopping_cart']:
+                transaction.shopping_cart.add(prod)
+            transaction.save()
+            record_sale(transaction)
         return transaction
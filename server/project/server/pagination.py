@@ -0,0 +1,29 @@
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+
+
+class PageSizePagination(PageNumberPagination):
+    """
+    Page number pagination letting clients ask for a page size
+    other than the default one, up to max_page_size elements,
+    so that tables can load exactly the rows they show.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Counterpart of paginate_queryset for async views, counting
+        the elements and fetching the page through the async ORM.
+        """
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        self.request = request
+        return self.page.object_list
@@ -0,0 +1,207 @@
+from datetime import datetime, time, timedelta
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Shop, FidelityProgram, Transaction, RollupWatermark, SettlementRollup, ShopDailySales, \
+    SettledProduct
+
+
+class IncrementalRollup:
+    """
+    Aggregates the stored transactions into a rollup table, one batch
+    of primary keys past its high-water mark at a time. Each batch is
+    aggregated by the database with a single GROUP BY query, then
+    merged into the stored rows in the same database transaction that
+    moves the mark: a run stopped halfway resumes where it left off,
+    and never counts a transaction twice.
+
+    Transactions are stored along with their cart in a single database
+    transaction, holding the write lock from its start, so they become
+    visible in primary key order and none is left behind the mark.
+    """
+    name = None
+    model = None
+    keys = ()
+    totals = ()
+
+    def aggregate(self, after, upto, using):
+        """
+        Returns the rows aggregating the transactions with a primary
+        key in the (after, upto] range, as dicts holding the keys and
+        the totals of the rollup.
+        """
+        raise NotImplementedError('aggregate() must be implemented.')
+
+    def run(self, batch_size=5000, using=DEFAULT_DB_ALIAS):
+        """
+        Aggregates the transactions stored since the last run.
+        Returns the primary key range aggregated.
+        """
+        last = Transaction.objects.using(using).aggregate(last=Max('pk'))['last'] or 0
+        start = None
+        while True:
+            with transaction.atomic(using=using):
+                mark, created = (RollupWatermark.objects.using(using).select_for_update()
+                                 .get_or_create(name=self.name))
+                start = mark.position if start is None else start
+                if mark.position >= last:
+                    return start, mark.position
+                upto = min(mark.position + batch_size, last)
+                self.merge(self.aggregate(mark.position, upto, using), using)
+                mark.position = upto
+                mark.save(update_fields=['position', 'updated_at'])
+
+    def rebuild(self, batch_size=5000, using=DEFAULT_DB_ALIAS):
+        with transaction.atomic(using=using):
+            self.model.objects.using(using).all().delete()
+            RollupWatermark.objects.using(using).filter(name=self.name).delete()
+        return self.run(batch_size, using)
+
+    def merge(self, rows, using):
+        rows = list(rows)
+        if not rows:
+            return
+        # A superset of the stored rows to update, narrowed down by key below
+        candidates = self.model.objects.using(using).filter(**{
+            f'{key}__in': {row[key] for row in rows} for key in self.keys
+        })
+        stored = {tuple(getattr(instance, key) for key in self.keys): instance for instance in candidates}
+        updated, created = [], []
+        for row in rows:
+            instance = stored.get(tuple(row[key] for key in self.keys))
+            if instance is None:
+                created.append(self.model(**row))
+                continue
+            for total in self.totals:
+                setattr(instance, total, getattr(instance, total) + row[total])
+            updated.append(instance)
+        self.model.objects.using(using).bulk_update(updated, self.totals, batch_size=500)
+        self.model.objects.using(using).bulk_create(created, batch_size=500)
+
+
+class SettlementRollupEngine(IncrementalRollup):
+    """
+    Rolls up the points issued and redeemed through the cart of each
+    transaction, by fidelity program, issuing shop, redeeming shop and
+    day. Points are the ones recorded by SettledProduct when the cart
+    was settled, so that later changes to products, their shop or the
+    coefficients of programs leave settlements already made untouched.
+    """
+    name = 'settlement'
+    model = SettlementRollup
+    keys = ('fidelity_program_id', 'issuing_shop_id', 'redeeming_shop_id', 'day')
+    totals = ('points_issued', 'points_redeemed')
+
+    def aggregate(self, after, upto, using):
+        return (SettledProduct.objects.using(using)
+                .filter(transaction_id__gt=after, transaction_id__lte=upto, transaction__shop__isnull=False)
+                .values('fidelity_program_id', 'issuing_shop_id',
+                        redeeming_shop_id=F('transaction__shop'),
+                        day=TruncDate('transaction__executed_at'))
+                .annotate(points_issued=Sum('points_issued'), points_redeemed=Sum('points_redeemed'))
+                .order_by())
+
+
+settlement_rollup = SettlementRollupEngine()
+
+
+def backfill_settled_products(batch_size=500, using=DEFAULT_DB_ALIAS):
+    """
+    Records the settled products of the transactions stored without,
+    e.g. loaded from fixtures, out of their products as they are now:
+    the closest to their settlement left to know. Returns the number
+    of transactions recorded.
+    """
+    unrecorded = (Transaction.objects.using(using).order_by('pk')
+                  .filter(shopping_cart__fidelity_program__isnull=False).distinct()
+                  .exclude(Exists(SettledProduct.objects.using(using).filter(transaction=OuterRef('pk')))))
+    recorded, last = 0, 0
+    while True:
+        batch = list(unrecorded.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            return recorded
+        for settled in batch:
+            SettledProduct.record(settled, using=using)
+        recorded += len(batch)
+        last = batch[-1].pk
+
+
+def settlement_report(fidelity_program: FidelityProgram, start, end, using=DEFAULT_DB_ALIAS):
+    """
+    Returns the points issued and redeemed in the given coalition
+    program between the start and end days included, by issuing and
+    redeeming shop, read from the settlement rollup alone.
+    """
+    return list(
+        SettlementRollup.objects.using(using)
+        .filter(fidelity_program=fidelity_program, day__gte=start, day__lte=end)
+        .values('issuing_shop_id', 'redeeming_shop_id')
+        .annotate(points_issued=Sum('points_issued'), points_redeemed=Sum('points_redeemed'))
+        .order_by('issuing_shop_id', 'redeeming_shop_id')
+    )
+
+
+def record_sale(settled: Transaction, using=DEFAULT_DB_ALIAS):
+    """
+    Adds a transaction just settled to the daily sales of its shop,
+    in the database transaction settling it.
+    """
+    if settled.shop_id is None:
+        return
+    day = timezone.localdate(settled.executed_at)
+    updated = ShopDailySales.objects.using(using).filter(shop_id=settled.shop_id, day=day).update(
+        revenue=F('revenue') + settled.total, transactions=F('transactions') + 1)
+    if not updated:
+        ShopDailySales.objects.using(using).create(shop_id=settled.shop_id, day=day, revenue=settled.total,
+                                                   transactions=1)
+
+
+def aggregate_daily_sales(start, end, using=DEFAULT_DB_ALIAS):
+    """
+    Returns the daily sales of every shop between the start and end
+    days included, aggregated from the stored transactions.
+    """
+    since, until = (timezone.make_aware(datetime.combine(day, time.min)) for day in (start, end + timedelta(days=1)))
+    return list(
+        Transaction.objects.using(using)
+        .filter(executed_at__gte=since, executed_at__lt=until, shop__isnull=False)
+        .values('shop_id', day=TruncDate('executed_at'))
+        .annotate(revenue=Sum('total'), transactions=Count('pk'))
+        .order_by()
+    )
+
+
+def replace_daily_sales(rows, start, end, using=DEFAULT_DB_ALIAS):
+    """
+    Replaces the daily sales stored between the start and end days
+    included with the given rows, as aggregate_daily_sales returns.
+    """
+    with transaction.atomic(using=using):
+        ShopDailySales.objects.using(using).filter(day__gte=start, day__lte=end).delete()
+        ShopDailySales.objects.using(using).bulk_create([ShopDailySales(**row) for row in rows], batch_size=500)
+
+
+def daily_sales_report(shop: Shop, start, end, using=DEFAULT_DB_ALIAS):
+    """
+    Returns the revenue, transaction count and average basket of the
+    given shop on each day it sold anything between the start and end
+    days included, along with their totals, read from the daily sales.
+    """
+    days = [
+        {'day': sales.day, 'revenue': sales.revenue, 'transactions': sales.transactions,
+         'average_basket': sales.average_basket}
+        for sales in (ShopDailySales.objects.using(using)
+                      .filter(shop=shop, day__gte=start, day__lte=end).order_by('day'))
+    ]
+    totals = ShopDailySales(revenue=sum(day['revenue'] for day in days),
+                            transactions=sum(day['transactions'] for day in days))
+    return {
+        'shop': shop.pk,
+        'start': start,
+        'end': end,
+        'revenue': totals.revenue,
+        'transactions': totals.transactions,
+        'average_basket': totals.average_basket,
+        'days': days,
+    }
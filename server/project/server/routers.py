@@ -0,0 +1,150 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_COOKIE = 'primary_pinned'
+
+
+@dataclass
+class RoutingState:
+    read_replica: bool = False
+    written: bool = False
+
+
+_routing: ContextVar[RoutingState | None] = ContextVar('db_routing', default=None)
+
+
+def replica_database():
+    """
+    Returns the alias of the read replica, or None when no replica
+    can serve reads: it is not configured, it is the primary itself
+    (as test mirrors are), or its SQLite copy was not made yet or was
+    not refreshed for READ_REPLICA_MAX_AGE seconds.
+    """
+    alias = getattr(settings, 'READ_REPLICA_DATABASE', None)
+    if alias is None or alias not in connections:
+        return None
+    replica = connections[alias].settings_dict
+    if replica['NAME'] == connections[DEFAULT_DB_ALIAS].settings_dict['NAME']:
+        return None
+    if connections[alias].vendor == 'sqlite':
+        try:
+            refreshed_at = os.path.getmtime(replica['NAME'])
+        except OSError:
+            return None
+        if time.time() - refreshed_at > settings.READ_REPLICA_MAX_AGE:
+            return None
+    return alias
+
+
+@contextmanager
+def primary_reads():
+    """
+    Sends to the primary the reads made within, even in a request
+    routed to the replica, e.g. the ones checking credentials, which
+    must see a revoked token or a changed password at once.
+    """
+    state = _routing.get()
+    if state is None:
+        yield
+        return
+    read_replica, state.read_replica = state.read_replica, False
+    try:
+        yield
+    finally:
+        state.read_replica = read_replica
+
+
+class ReadReplicaRouter:
+    """
+    Sends the reads of the requests ReadReplicaMiddleware chose to
+    the read replica, and every other query to the primary, whatever
+    database the written instances were read from. Once a request
+    writes, its following reads go to the primary as well.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is not None and state.read_replica and not state.written:
+            return settings.READ_REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.written = True
+        # Instances read from the replica are written back to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, getattr(settings, 'READ_REPLICA_DATABASE', None)}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets the schema of the primary along with its data
+        return db != getattr(settings, 'READ_REPLICA_DATABASE', None)
+
+
+class ReadReplicaMiddleware:
+    """
+    Lets the safe requests to the list actions, and to the viewsets
+    declaring read_replica, read from the replica. Actions can opt out
+    through @action(read_replica=False).
+
+    Since the replica lags behind the primary, a client which wrote
+    is pinned to the primary for READ_REPLICA_PIN_SECONDS through a
+    cookie, so that it reads back what it wrote.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _routing.set(RoutingState())
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        token = _routing.set(RoutingState())
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.READ_REPLICA_PIN_SECONDS, httponly=True)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        if state is None or request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+            return None
+        viewset = getattr(view_func, 'cls', None)
+        action = (getattr(view_func, 'actions', None) or {}).get(request.method.lower())
+        if viewset is None or action is None:
+            return None
+        initkwargs = getattr(view_func, 'initkwargs', {})
+        read_replica = initkwargs.get('read_replica', getattr(viewset, 'read_replica', False))
+        if action == 'list' or read_replica:
+            state.read_replica = replica_database() is not None
+        return None
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+import drf_spectacular
+import rest_framework
+from django.conf import settings
+from drf_spectacular.settings import spectacular_settings
+
+_generation_lock = Lock()
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """
+    Returns a digest of the code the schema is generated from: the
+    sources of the project and of the server app, together with the
+    versions of the libraries introspecting them.
+    """
+    digest = hashlib.sha256(f'{rest_framework.VERSION}:{drf_spectacular.__version__}'.encode())
+    for source in sorted(Path(settings.BASE_DIR).glob('*/**/*.py')):
+        if 'migrations' in source.parts or 'tests' in source.parts:
+            continue
+        digest.update(str(source.relative_to(settings.BASE_DIR)).encode())
+        digest.update(source.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def schema_artifact_path(version):
+    return Path(settings.SCHEMA_ARTIFACT_DIR) / f'schema-{version}.json'
+
+
+def generate_schema(version=None):
+    """
+    Generates the OpenAPI schema of the API and stores it as the
+    artifact of the given code version, removing the artifacts of
+    other versions. Returns the path of the stored artifact.
+    """
+    version = version or code_version()
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    path = schema_artifact_path(version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix('.partial')
+    partial.write_text(json.dumps(schema), encoding='utf-8')
+    os.replace(partial, path)
+    for stale in path.parent.glob('schema-*.json'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+@lru_cache(maxsize=None)
+def load_schema(version):
+    """
+    Returns the schema of the given code version, generating its
+    artifact first if the build did not.
+    """
+    path = schema_artifact_path(version)
+    with _generation_lock:
+        if not path.exists():
+            generate_schema(version)
+    return json.loads(path.read_text(encoding='utf-8'))
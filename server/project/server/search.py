@@ -0,0 +1,177 @@
+import re
+from django.db import connections, router, DEFAULT_DB_ALIAS
+from .models import Shop, FidelityProgram, Product
+
+SEARCH_TABLE = 'server_searchindex'
+SEARCH_ROWS_TABLE = 'server_searchindex_rows'
+
+# Searchable models, identified by the kind label stored in the index,
+# together with the two text fields (name, detail) indexed for each one.
+SEARCHABLE_MODELS = {
+    'shop': (Shop, 'name', 'location'),
+    'product': (Product, 'name', None),
+    'fidelityprogram': (FidelityProgram, 'name', 'description'),
+}
+SEARCH_KINDS = {model: kind for kind, (model, name, detail) in SEARCHABLE_MODELS.items()}
+
+# Matches on the name column weigh more than matches on the detail one.
+NAME_WEIGHT = 10.0
+DETAIL_WEIGHT = 1.0
+
+
+def search_index_supported(using=DEFAULT_DB_ALIAS):
+    return connections[using].vendor == 'sqlite'
+
+
+def create_search_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Creates the FTS5 virtual table backing the search
+    endpoint, along with the lookup table mapping each
+    indexed model instance to its row in the index.
+    """
+    if not search_index_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {SEARCH_ROWS_TABLE} ('
+            'id INTEGER PRIMARY KEY, '
+            'kind VARCHAR(20) NOT NULL, '
+            'object_key VARCHAR(30) NOT NULL, '
+            'UNIQUE (kind, object_key))'
+        )
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+            'name, detail, '
+            "tokenize = 'unicode61 remove_diacritics 2', "
+            "prefix = '2 3')"
+        )
+
+
+def index_document(instance):
+    """
+    Stores or refreshes the index entry of the given
+    Shop, Product or FidelityProgram instance.
+    """
+    kind = SEARCH_KINDS[type(instance)]
+    model, name_field, detail_field = SEARCHABLE_MODELS[kind]
+    using = router.db_for_write(model, instance=instance)
+    if not search_index_supported(using):
+        return
+    name = getattr(instance, name_field) or ''
+    detail = (getattr(instance, detail_field) or '') if detail_field is not None else ''
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'SELECT id FROM {SEARCH_ROWS_TABLE} WHERE kind = %s AND object_key = %s',
+            [kind, str(instance.pk)]
+        )
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                f'INSERT INTO {SEARCH_ROWS_TABLE} (kind, object_key) VALUES (%s, %s)',
+                [kind, str(instance.pk)]
+            )
+            rowid = cursor.lastrowid
+        else:
+            rowid = row[0]
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [rowid])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, name, detail) VALUES (%s, %s, %s)',
+            [rowid, name, detail]
+        )
+
+
+def unindex_document(instance):
+    """
+    Removes the index entry of the given Shop, Product
+    or FidelityProgram instance, if any.
+    """
+    kind = SEARCH_KINDS[type(instance)]
+    using = router.db_for_write(type(instance), instance=instance)
+    if not search_index_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'SELECT id FROM {SEARCH_ROWS_TABLE} WHERE kind = %s AND object_key = %s',
+            [kind, str(instance.pk)]
+        )
+        row = cursor.fetchone()
+        if row is not None:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', row)
+            cursor.execute(f'DELETE FROM {SEARCH_ROWS_TABLE} WHERE id = %s', row)
+
+
+def rebuild_search_index(using=DEFAULT_DB_ALIAS, batch_size=5000):
+    """
+    Empties and fills again the whole search index
+    from the current database content. Returns the
+    number of indexed documents.
+    """
+    if not search_index_supported(using):
+        return 0
+    create_search_index(using)
+    indexed = 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(f'DELETE FROM {SEARCH_ROWS_TABLE}')
+        for kind, (model, name_field, detail_field) in SEARCHABLE_MODELS.items():
+            fields = ['pk', name_field] + ([detail_field] if detail_field is not None else [])
+            rows = model.objects.using(using).values_list(*fields).iterator(chunk_size=batch_size)
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_size:
+                    indexed += _bulk_index(cursor, kind, batch)
+                    batch = []
+            indexed += _bulk_index(cursor, kind, batch)
+    return indexed
+
+
+def _bulk_index(cursor, kind, batch):
+    if not batch:
+        return 0
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {SEARCH_ROWS_TABLE}')
+    first_id = cursor.fetchone()[0] + 1
+    cursor.executemany(
+        f'INSERT INTO {SEARCH_ROWS_TABLE} (id, kind, object_key) VALUES (%s, %s, %s)',
+        [(first_id + i, kind, str(row[0])) for i, row in enumerate(batch)]
+    )
+    cursor.executemany(
+        f'INSERT INTO {SEARCH_TABLE} (rowid, name, detail) VALUES (%s, %s, %s)',
+        [(first_id + i, row[1] or '', (row[2] if len(row) > 2 else '') or '') for i, row in enumerate(batch)]
+    )
+    return len(batch)
+
+
+def match_expression(query):
+    """
+    Converts free text typed by a client into an FTS5
+    MATCH expression, where every word is a prefix term
+    and all of them must be found.
+    """
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search(query, kinds=None, limit=20, using=DEFAULT_DB_ALIAS):
+    """
+    Runs a ranked prefix search over the index, returning a list
+    of (kind, object key, score) tuples, best matches first.
+    Lower scores are better, as computed by the FTS5 bm25 function.
+    """
+    expression = match_expression(query)
+    if not expression or not search_index_supported(using):
+        return []
+    sql = (
+        f'SELECT r.kind, r.object_key, bm25({SEARCH_TABLE}, %s, %s) AS score '
+        f'FROM {SEARCH_TABLE} JOIN {SEARCH_ROWS_TABLE} r ON r.id = {SEARCH_TABLE}.rowid '
+        f'WHERE {SEARCH_TABLE} MATCH %s'
+    )
+    params = [NAME_WEIGHT, DETAIL_WEIGHT, expression]
+    if kinds:
+        sql += ' AND r.kind IN ({})'.format(', '.join(['%s'] * len(kinds)))
+        params += list(kinds)
+    sql += ' ORDER BY score LIMIT %s'
+    params.append(limit)
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
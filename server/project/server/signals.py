@@ -0,0 +1,165 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .models import User, Shop, FidelityProgram, Catalogue, Product, Transaction, OutboxEvent, points_changed
+from .search import index_document, unindex_document
+from .dashboard import invalidate_dashboard
+from .thresholds import prize_thresholds
+from .authentication import token_cache
+from .avatars import generate_variants
+from .counters import COUNTERS, refresh_counts
+
+
+@receiver(post_save, sender=Shop)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=FidelityProgram)
+def update_search_index(sender, instance, **kwargs):
+    index_document(instance)
+
+
+@receiver(post_delete, sender=Shop)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=FidelityProgram)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_document(instance)
+
+
+@receiver(post_save, sender=Transaction)
+def invalidate_settled_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(instance.user_id)
+
+
+@receiver(post_save, sender=Catalogue)
+@receiver(post_delete, sender=Catalogue)
+def invalidate_member_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(instance.customer_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(instance.username)
+
+
+@receiver(m2m_changed, sender=Product.owning_users.through)
+def invalidate_owner_dashboard(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        invalidate_dashboard(instance.username)
+    else:
+        for username in pk_set or ():
+            invalidate_dashboard(username)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_prize_thresholds(sender, instance, **kwargs):
+    prize_thresholds.invalidate(fidelity_program=instance.fidelity_program_id, product=instance.pk)
+
+
+@receiver(points_changed, sender=Catalogue)
+def notify_affordable_prizes(sender, customer, fidelity_program, previous, current, **kwargs):
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(
+            kind=OutboxEvent.PRIZE_AFFORDABLE,
+            customer_id=customer,
+            fidelity_program_id=fidelity_program,
+            product_id=product,
+            balance=current,
+        )
+        for product in prize_thresholds.crossed(fidelity_program, previous, current)
+    ])
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    token_cache.invalidate(key=instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    # Cached tokens carry the user as it was, e.g. still active
+    token_cache.invalidate(user=instance.pk)
+
+
+@receiver(post_save, sender=User)
+def generate_avatar_variants(sender, instance, raw=False, using=None, **kwargs):
+    # Fixtures may reference avatars that were never uploaded
+    if raw:
+        return
+    variants = generate_variants(instance.avatar.name, stored=instance.avatar_variants) if instance.avatar else {}
+    if variants != instance.avatar_variants:
+        instance.avatar_variants = variants
+        User.objects.using(using).filter(pk=instance.pk).update(avatar_variants=variants)
+
+
+@receiver(m2m_changed, sender=FidelityProgram.shop_list.through)
+@receiver(m2m_changed, sender=Shop.employees.through)
+@receiver(m2m_changed, sender=Product.owning_users.through)
+def count_changed_relations(sender, instance, action, reverse, pk_set, using, **kwargs):
+    counter = COUNTERS[sender]
+    if action == 'pre_clear' and reverse:
+        instance._counted_before = counter.targets_related_to(instance.pk, using=using)
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        counter.refresh([instance.pk], using=using)
+        counter.reload(instance, using=using)
+    elif action == 'post_clear':
+        counter.refresh(instance.__dict__.pop('_counted_before', ()), using=using)
+    elif pk_set:
+        counter.refresh(pk_set, using=using)
+
+
+@receiver(pre_delete, sender=User)
+@receiver(pre_delete, sender=Shop)
+def remember_counted_relations(sender, instance, using, **kwargs):
+    # Deleting the instance cascades to many-to-many rows, without signals
+    instance._counted_relations = [
+        (counter, counter.targets_related_to(instance.pk, using=using)) for counter in COUNTERS.values()
+        if counter.other_fk and counter.related._meta.get_field(counter.other_fk).related_model is sender
+    ]
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Shop)
+def count_deleted_relations(sender, instance, using, **kwargs):
+    for counter, targets in instance.__dict__.pop('_counted_relations', ()):
+        counter.refresh(targets, using=using)
+
+
+@receiver(pre_save, sender=Catalogue)
+@receiver(pre_save, sender=Product)
+def remember_counted_relation(sender, instance, raw, using, **kwargs):
+    # The count of the instance previously related has to be refreshed as well
+    if not raw and not instance._state.adding:
+        counter = COUNTERS[sender]
+        instance._counted_before = (sender._default_manager.using(using).filter(pk=instance.pk)
+                                    .values_list(f'{counter.fk}_id', flat=True).first())
+
+
+@receiver(post_save, sender=Catalogue)
+@receiver(post_save, sender=Product)
+def count_saved_relation(sender, instance, created, using, **kwargs):
+    counter = COUNTERS[sender]
+    target = counter.target_of(instance)
+    before = instance.__dict__.pop('_counted_before', target)
+    if created or before != target:
+        counter.refresh([before, target], using=using)
+
+
+@receiver(post_save, sender=Shop)
+@receiver(post_save, sender=FidelityProgram)
+@receiver(post_save, sender=Product)
+def recount_saved_counts(sender, instance, using, **kwargs):
+    # The instance was stored with the counts it had in memory, maybe stale
+    refresh_counts(instance, using=using)
+
+
+@receiver(post_delete, sender=Catalogue)
+@receiver(post_delete, sender=Product)
+def count_removed_relation(sender, instance, using, **kwargs):
+    counter = COUNTERS[sender]
+    counter.refresh([counter.target_of(instance)], using=using)
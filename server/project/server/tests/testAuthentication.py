@@ -0,0 +1,129 @@
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from server.models import User
+from server.authentication import token_cache, password_verifier
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    """
+    Test token authentication served from
+    the verified token cache
+    """
+    def setUp(self):
+        token_cache.clear()
+        self.user, created = User.objects.get_or_create(
+            username="Luca91",
+            password="lucarossi#91",
+            bio="I am a cashier!",
+            location="Camerino"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_api_cached_token(self):
+        """
+        Should verify a token against the database
+        once, then serve it from the cache
+        """
+        with self.assertNumQueries(1):
+            response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.get('/metrics/')
+        self.assertEqual(response.data['token_cache']['hits'], 1)
+        self.assertEqual(response.data['token_cache']['misses'], 1)
+        self.assertEqual(response.data['token_cache']['hit_ratio'], 0.5)
+
+    def test_api_rotated_token_rejected(self):
+        """
+        Should reject a cached token as soon
+        as it is deleted or rotated
+        """
+        self.assertEqual(self.client.get('/metrics/').status_code, status.HTTP_200_OK)
+        self.token.delete()
+        self.assertEqual(self.client.get('/metrics/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_api_logout(self):
+        """
+        Should revoke the token of the request
+        through POST request
+        """
+        self.assertEqual(self.client.get('/metrics/').status_code, status.HTTP_200_OK)
+        response = self.client.post('/api-token-logout/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(self.client.get('/metrics/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_cache_bounded(self):
+        """ Should evict the least recently used tokens """
+        token_cache.maxsize, maxsize = 1, token_cache.maxsize
+        try:
+            other, created = User.objects.get_or_create(username="Marco91", password="marcorossi#91")
+            token_cache.put('first', (self.user, self.token), token_cache.generation)
+            token_cache.put('second', (other, self.token), token_cache.generation)
+            self.assertIsNone(token_cache.get('first'))
+            self.assertIsNotNone(token_cache.get('second'))
+            self.assertEqual(token_cache.metrics()['evictions'], 1)
+        finally:
+            token_cache.maxsize = maxsize
+
+
+class LoginTestCase(APITestCase):
+    """
+    Test token issuing through the
+    asynchronous login endpoint
+    """
+    def setUp(self):
+        self.user = User(username="Luca91", bio="I am a cashier!", location="Camerino")
+        self.user.set_password("lucarossi#91")
+        self.user.save()
+
+    def test_api_login(self):
+        """
+        Should issue a token once, then hand
+        the same one out at each login
+        """
+        credentials = {'username': 'Luca91', 'password': 'lucarossi#91'}
+        response = self.client.post('/api-token-auth/', credentials)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['token'], Token.objects.get(user=self.user).key)
+        self.assertEqual(response.json()['url'], 'http://testserver/users/Luca91/')
+        again = self.client.post('/api-token-auth/', credentials, format='json')
+        self.assertEqual(again.json()['token'], response.json()['token'])
+
+    def test_api_login_invalid_credentials(self):
+        """ Should not issue tokens for wrong or missing credentials """
+        response = self.client.post('/api-token-auth/', {'username': 'Luca91', 'password': 'wrong'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', response.json())
+        response = self.client.post('/api-token-auth/', {'username': 'Nobody', 'password': 'lucarossi#91'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api-token-auth/', {'username': 'Luca91'})
+        self.assertEqual(response.json(), {'password': ['This field is required.']})
+
+    def test_api_login_malformed_body(self):
+        """ Should refuse bodies which are not valid JSON objects """
+        response = self.client.post('/api-token-auth/', '{"username": ', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('detail', response.json())
+        response = self.client.post('/api-token-auth/', ['Luca91', 'lucarossi#91'], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', response.json())
+
+    def test_api_login_shed_when_saturated(self):
+        """
+        Should refuse logins with a 429 while every
+        verification slot is taken
+        """
+        slots = password_verifier.workers + password_verifier.backlog
+        for _ in range(slots):
+            password_verifier.slots.acquire()
+        try:
+            response = self.client.post('/api-token-auth/', {'username': 'Luca91', 'password': 'lucarossi#91'})
+        finally:
+            for _ in range(slots):
+                password_verifier.slots.release()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertIn('non_field_errors', response.json())
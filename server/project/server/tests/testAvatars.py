@@ -0,0 +1,103 @@
+import tempfile
+from unittest import mock
+from io import BytesIO, StringIO
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+from server.avatars import generate_variants
+from server.models import User
+
+
+def image_upload(name='me.jpg', size=(640, 480)):
+    content = BytesIO()
+    Image.new('RGB', size, 'orange').save(content, format='JPEG')
+    return SimpleUploadedFile(name, content.getvalue(), content_type='image/jpeg')
+
+
+class AvatarAPITestCase(APITestCase):
+    """
+    Test the thumbnail variants generated
+    for the avatars of users
+    """
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.settings = override_settings(MEDIA_ROOT=self.media.name,
+                                          AVATAR_VARIANTS={'small': 64, 'medium': 256})
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.media.cleanup()
+
+    def open_variant(self, user, variant):
+        return Image.open(user.avatar.storage.open(user.avatar_variants[variant]))
+
+    def test_variants_generated_on_upload(self):
+        """
+        Should store square variants next to the
+        original and expose their URLs
+        """
+        user = User.objects.create(username='Marco91', password='marcorossi#91', avatar=image_upload())
+        self.assertEqual(self.open_variant(user, 'small').size, (64, 64))
+        self.assertEqual(self.open_variant(user, 'medium').size, (256, 256))
+        self.assertEqual(User.objects.get().avatar_variants, user.avatar_variants)
+        response = self.client.get('/users/Marco91/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['avatar_variants'], {
+            'small': f'http://testserver/media/{user.avatar_variants["small"]}',
+            'medium': f'http://testserver/media/{user.avatar_variants["medium"]}',
+        })
+
+    def test_variants_served_with_caching(self):
+        """
+        Should serve variants to be cached for good,
+        answering conditional requests with a 304
+        """
+        user = User.objects.create(username='Marco91', password='marcorossi#91', avatar=image_upload())
+        url = f'/media/{user.avatar_variants["small"]}'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('immutable', response['Cache-Control'])
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_variants_named_after_content(self):
+        """
+        Should store variants generated again with
+        other bytes under new names
+        """
+        user = User.objects.create(username='Marco91', password='marcorossi#91', avatar=image_upload())
+        stored = user.avatar_variants
+        self.assertEqual(generate_variants(user.avatar.name, stored=stored, force=True), stored)
+        with override_settings(AVATAR_VARIANTS={'small': 32, 'medium': 256}):
+            call_command('backfill_avatars', processes=1, force=True, stdout=StringIO())
+        regenerated = User.objects.get().avatar_variants
+        self.assertNotEqual(regenerated['small'], stored['small'])
+        self.assertEqual(regenerated['medium'], stored['medium'])
+
+    def test_invalid_avatars(self):
+        """
+        Should generate no variants for truncated
+        or oversized images
+        """
+        truncated = image_upload()
+        truncated.file.truncate(len(truncated.file.getvalue()) // 2)
+        user = User.objects.create(username='Marco91', password='marcorossi#91', avatar=truncated)
+        self.assertEqual(user.avatar_variants, {})
+        with override_settings(AVATAR_VARIANTS={'small': 64}), \
+                mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            oversized = default_storage.save('users/avatars/big.jpg', image_upload('big.jpg'))
+            self.assertEqual(generate_variants(oversized), {})
+
+    def test_backfill_avatars(self):
+        """
+        Should generate the variants missing
+        for avatars stored before
+        """
+        user = User.objects.create(username='Marco91', password='marcorossi#91', avatar=image_upload())
+        user.avatar.storage.delete(user.avatar_variants['small'])
+        call_command('backfill_avatars', processes=1, stdout=StringIO())
+        self.assertEqual(self.open_variant(User.objects.get(), 'small').size, (64, 64))
@@ -204,4 +204,24 @@ class CatalogueTestCase(APITestCase):
         self.assertEqual(response_two.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response_one.json()), 1)
         self.assertEqual(len(response_two.json()), 2)
-        
\ No newline at end of file
+        
+    def test_api_filter_catalogue_elements(self):
+        response_one = self.client.get('/catalogue/', {'fidelity_program': 'Programma punti'})
+        response_two = self.client.get('/catalogue/', {'points_min': 5.0})
+        response_three = self.client.get('/catalogue/', {'fidelity_program': 'Programma fedeltà', 'points_max': 5.0})
+        self.assertEqual(response_one.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response_one.json()['results']), 2)
+        self.assertEqual(len(response_two.json()['results']), 1)
+        self.assertEqual(len(response_three.json()['results']), 2)
+
+    def test_api_available_prizes_in_all_programs(self):
+        response_one = self.client.get('/catalogue/available_prizes/Claudio91/')
+        response_two = self.client.get('/catalogue/available_prizes/Paolo91/')
+        self.assertEqual(response_one.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_two.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response_one.json()), 4)
+        self.assertEqual(len(response_two.json()), 1)
+        with self.assertNumQueries(4):
+            self.client.get('/catalogue/available_prizes/Paolo91/')
+        with self.assertNumQueries(4):
+            self.client.get('/catalogue/available_prizes/Claudio91/')
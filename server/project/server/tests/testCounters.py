@@ -0,0 +1,86 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from server.models import User, Shop, FidelityProgram, Catalogue, Product
+
+
+class CountersTestCase(TestCase):
+    """
+    Test the relationship counts stored on shops,
+    fidelity programs and products
+    """
+    def setUp(self):
+        for username in ['Marco91', 'Luca91', 'Anna90']:
+            User.objects.create(username=username, password='password#91', location='Camerino')
+        self.shop = Shop.objects.create(name='La buona pizza', email='buona.pizza@gmail.com',
+                                        phone='+393271234567', location='Camerino', owner_id='Marco91')
+        self.other_shop = Shop.objects.create(name='Il buon caffè', email='buon.caffe@gmail.com',
+                                              phone='+393271234568', location='Camerino', owner_id='Marco91')
+        self.program = FidelityProgram.objects.create(name='Programma fedeltà', description='Test program')
+
+    def counts(self, instance, *fields):
+        return tuple(type(instance).objects.values_list(*fields).get(pk=instance.pk))
+
+    def test_many_to_many_counts(self):
+        """
+        Should count the relations added and removed
+        from either side, or cleared
+        """
+        self.program.shop_list.add(self.shop, self.other_shop)
+        self.assertTrue(self.program.is_coalition())
+        self.shop.employees.add('Luca91', 'Anna90')
+        User.objects.get(username='Marco91').shop_set.add(self.shop)
+        self.assertEqual(self.counts(self.shop, 'employee_count'), (3,))
+        self.shop.employees.remove('Luca91')
+        self.assertEqual(self.counts(self.shop, 'employee_count'), (2,))
+        self.program.shop_list.clear()
+        self.assertEqual(self.counts(self.program, 'shop_count'), (0,))
+        self.assertFalse(FidelityProgram.objects.get().is_coalition())
+
+    def test_foreign_key_counts(self):
+        """
+        Should count members and products as they are
+        stored, moved and deleted
+        """
+        self.program.shop_list.add(self.shop)
+        product = Product.objects.create(name='Pizza', value=8.0, shop=self.shop, fidelity_program=self.program)
+        product.owning_users.add('Luca91', 'Anna90')
+        Catalogue.objects.create(customer_id='Luca91', fidelity_program=self.program)
+        Catalogue.objects.create(customer_id='Anna90', fidelity_program=self.program)
+        self.assertEqual(self.counts(self.program, 'member_count'), (2,))
+        self.assertEqual(self.counts(self.shop, 'product_count'), (1,))
+        self.assertEqual(self.counts(product, 'owner_count'), (2,))
+        product.shop = self.other_shop
+        product.save()
+        self.assertEqual(self.counts(self.shop, 'product_count'), (0,))
+        self.assertEqual(self.counts(self.other_shop, 'product_count'), (1,))
+        User.objects.get(username='Anna90').delete()
+        self.assertEqual(self.counts(product, 'owner_count'), (1,))
+        Catalogue.objects.filter(customer_id='Luca91').delete()
+        self.assertEqual(self.counts(self.program, 'member_count'), (1,))
+
+    def test_stale_instance_save(self):
+        """
+        Should keep counts when an instance loaded
+        before its relations changed is saved
+        """
+        shop = Shop.objects.get(pk=self.shop.pk)
+        self.shop.employees.add('Luca91')
+        shop.location = 'Macerata'
+        shop.save()
+        self.assertEqual(self.counts(self.shop, 'employee_count', 'location'), (1, 'Macerata'))
+
+    def test_repair_counters(self):
+        """
+        Should recompute counts drifted through
+        updates bypassing the signals
+        """
+        self.shop.employees.add('Luca91', 'Anna90')
+        Shop.objects.update(employee_count=7)
+        call_command('repair_counters', dry_run=True, stdout=StringIO())
+        self.assertEqual(self.counts(self.shop, 'employee_count'), (7,))
+        output = StringIO()
+        call_command('repair_counters', stdout=output)
+        self.assertIn('Shop.employee_count: 2 drifted', output.getvalue())
+        self.assertEqual(self.counts(self.shop, 'employee_count'), (2,))
+        self.assertEqual(self.counts(self.other_shop, 'employee_count'), (0,))
@@ -0,0 +1,125 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from server.models import User, Shop, FidelityProgram, Catalogue, Product, Transaction
+
+
+class DashboardTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop_admin = User.objects.get_or_create(
+            username="Marco91",
+            password="marcorossi#91",
+            bio="I own a shop!",
+            location="Camerino"
+        )
+        self.customer = User.objects.get_or_create(
+            username="Luca91",
+            password="lucarossi#91",
+            bio="I am a customer!",
+            location="Camerino"
+        )
+        self.shop = Shop.objects.get_or_create(
+            name='La buona pizza',
+            email='buona.pizza@gmail.com',
+            phone='+393271234567',
+            location='Camerino',
+            owner_id="Marco91"
+        )
+        self.fidelity_program = FidelityProgram(
+            name='Programma punti',
+            program_type=FidelityProgram.POINTS,
+            description='Test fidelity program',
+            points_coefficient=1.0,
+            prize_coefficient=1.0
+        )
+        self.fidelity_program.save()
+        self.fidelity_program.shop_list.add('La buona pizza')
+        self.product, product_success = Product.objects.get_or_create(
+            name='Pizza margherita',
+            value=5.0,
+            shop_id='La buona pizza',
+            fidelity_program_id='Programma punti',
+        )
+        self.cheap_prize, prize_success = Product.objects.get_or_create(
+            name='Bibita omaggio',
+            value=3.0,
+            shop_id='La buona pizza',
+            fidelity_program_id='Programma punti',
+            is_persistent=True
+        )
+        self.expensive_prize, prize_success = Product.objects.get_or_create(
+            name='Pizza omaggio',
+            value=8.0,
+            shop_id='La buona pizza',
+            fidelity_program_id='Programma punti',
+            is_persistent=True
+        )
+        self.catalogue, catalogue_success = Catalogue.objects.get_or_create(
+            customer_id='Luca91',
+            fidelity_program_id='Programma punti',
+            points=4.0
+        )
+
+    def add_program(self, name):
+        program = FidelityProgram(name=name, description='Another program')
+        program.save()
+        program.shop_list.add('La buona pizza')
+        Product.objects.get_or_create(name=f'Premio {name}', value=1.0, shop_id='La buona pizza',
+                                      fidelity_program_id=name, is_persistent=True)
+        Catalogue.objects.get_or_create(customer_id='Luca91', fidelity_program_id=name, points=2.0)
+
+    def settle(self, *products):
+        transaction = Transaction(user_id='Luca91', shop_id='La buona pizza')
+        transaction.shopping_cart.add(*products)
+        transaction.save()
+        return transaction
+
+    def test_api_dashboard(self):
+        self.settle(self.product)
+        response = self.client.get('/users/Luca91/dashboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        summary = response.json()
+        self.assertEqual(summary['user']['username'], 'Luca91')
+        self.assertEqual(len(summary['programs']), 1)
+        self.assertEqual(summary['programs'][0]['points'], 9.0)
+        self.assertEqual([pr['name'] for pr in summary['programs'][0]['affordable_prizes']],
+                         ['Bibita omaggio', 'Pizza omaggio'])
+        self.assertEqual(summary['owned_prizes'], [])
+        self.assertEqual(len(summary['transactions']), 1)
+
+    def test_api_dashboard_fixed_queries(self):
+        """ Should build the summary with the same queries whatever the number of programs """
+        self.settle(self.product)
+        with CaptureQueriesContext(connection) as one_program:
+            self.client.get('/users/Luca91/dashboard/')
+        for name in ('Programma uno', 'Programma due', 'Programma tre'):
+            self.add_program(name)
+        self.settle(self.product)
+        self.settle(self.product)
+        with self.assertNumQueries(len(one_program)):
+            response = self.client.get('/users/Luca91/dashboard/')
+        self.assertEqual(len(response.json()['programs']), 4)
+        self.assertEqual(len(response.json()['transactions']), 3)
+
+    def test_api_dashboard_cache(self):
+        """ Should serve the summary from cache until a settlement changes it """
+        self.client.get('/users/Luca91/dashboard/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/users/Luca91/dashboard/')
+        self.assertEqual([pr['name'] for pr in response.json()['programs'][0]['affordable_prizes']],
+                         ['Bibita omaggio'])
+        self.settle(self.product)
+        response = self.client.get('/users/Luca91/dashboard/')
+        self.assertEqual(response.json()['programs'][0]['points'], 9.0)
+        self.assertEqual(len(response.json()['programs'][0]['affordable_prizes']), 2)
+
+    def test_api_dashboard_transactions_limit(self):
+        self.settle(self.product)
+        self.settle(self.product)
+        response = self.client.get('/users/Luca91/dashboard/', {'transactions': 1})
+        self.assertEqual(len(response.json()['transactions']), 1)
+        response = self.client.get('/users/Luca91/dashboard/', {'transactions': 'all'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
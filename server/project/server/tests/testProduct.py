@@ -4,6 +4,8 @@ from django.db.utils import IntegrityError
 from rest_framework import status
 from rest_framework.test import APITestCase
 from server.models import User, Shop, FidelityProgram, Product
+from server.filters import check_indexed, check_indexed_views
+from server.views import ProductViewSet
 import json
 
 def resource_full_url(objpath):
@@ -307,4 +309,52 @@ class ProductAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Product.objects.count(), 1)
         self.assertFalse(Product.objects.filter(pk=1).exists())
-        self.assertTrue(Product.objects.filter(pk=2).exists())
\ No newline at end of file
+        self.assertTrue(Product.objects.filter(pk=2).exists())
+
+    def test_api_filter_products(self):
+        """
+        Should filter and order products through
+        query string parameters
+        """
+        Product.objects.get_or_create(name='Pizza margherita', value=5.0, shop_id='La buona pizza',
+                                      fidelity_program_id='Programma fedelta')
+        Product.objects.get_or_create(name='Pizza diavola', value=5.5, shop_id='La buona pizza')
+        Product.objects.get_or_create(name='Coupon', value=3.0, shop_id='La buona pizza',
+                                      fidelity_program_id='Programma fedelta', is_persistent=True)
+        response = self.client.get('/product/', {'fidelity_program': 'Programma fedelta', 'is_persistent': 'false'})
+        self.assertEqual([pr['name'] for pr in response.json()['results']], ['Pizza margherita'])
+        response = self.client.get('/product/', {'value_min': 4.0, 'ordering': '-value'})
+        self.assertEqual([pr['name'] for pr in response.json()['results']], ['Pizza diavola', 'Pizza margherita'])
+        response = self.client.get('/product/', {'shop': 'La buona pizza', 'value_max': 'cheap'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_api_filter_products_by_pk(self):
+        """
+        Should fetch several products at once by
+        repeating the pk query string parameter
+        """
+        for name in ['Pizza margherita', 'Pizza diavola', 'Pizza funghi']:
+            Product.objects.get_or_create(name=name, value=5.0, shop_id='La buona pizza')
+        ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+        response = self.client.get('/product/', {'pk': [ids[0], ids[2]]})
+        self.assertEqual([pr['name'] for pr in response.json()['results']], ['Pizza margherita', 'Pizza funghi'])
+        response = self.client.get('/product/', {'pk': 'first'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_api_filter_only_indexed_fields(self):
+        """
+        Should not allow filtering or ordering
+        on fields which are not indexed
+        """
+        class UnindexedProductViewSet(ProductViewSet):
+            filter_fields = {'points_min': 'points_coefficient__gte', 'shop': 'shop'}
+            ordering_fields = ['prize_coefficient', 'value']
+
+        errors = check_indexed(UnindexedProductViewSet)
+        self.assertEqual([error.id for error in errors], ['server.E001', 'server.E001'])
+        self.assertEqual(check_indexed(ProductViewSet), [])
+        self.assertEqual(check_indexed_views(), [])
+        Product.objects.get_or_create(name='Pizza diavola', value=5.5, shop_id='La buona pizza')
+        response = self.client.get('/product/', {'ordering': 'name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 1)
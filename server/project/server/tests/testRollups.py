@@ -0,0 +1,192 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from server.models import User, Shop, FidelityProgram, Catalogue, Product, Transaction, SettlementRollup, \
+    ShopDailySales, SettledProduct
+from server.rollups import settlement_rollup, settlement_report
+
+
+class SettlementRollupTestCase(TestCase):
+    """
+    Test the rollup of the points issued and
+    redeemed across the shops of a coalition
+    """
+    def setUp(self):
+        User.objects.create(username='Marco91', password='marcorossi#91', location='Camerino')
+        User.objects.create(username='Luca91', password='lucarossi#91', location='Camerino')
+        Shop.objects.create(name='La buona pizza', email='buona.pizza@gmail.com', phone='+393271234567',
+                            location='Camerino', owner_id='Marco91')
+        Shop.objects.create(name='Il buon caffè', email='buon.caffe@gmail.com', phone='+393271234568',
+                            location='Camerino', owner_id='Marco91')
+        self.program = FidelityProgram.objects.create(name='Coalizione', description='Test coalition',
+                                                      program_type=FidelityProgram.POINTS, points_coefficient=0.5)
+        self.program.shop_list.add('La buona pizza', 'Il buon caffè')
+        Catalogue.objects.create(customer_id='Luca91', fidelity_program=self.program, points=100.0)
+        self.pizza = Product.objects.create(name='Pizza margherita', value=8.0, shop_id='La buona pizza',
+                                            fidelity_program=self.program)
+        self.prize = Product.objects.create(name='Pizza omaggio', value=20.0, shop_id='La buona pizza',
+                                            fidelity_program=self.program, is_persistent=True)
+        self.coffee = Product.objects.create(name='Caffè', value=1.0, shop_id='Il buon caffè',
+                                             fidelity_program=self.program, points_coefficient=2.0)
+
+    def settle(self, shop, *products):
+        transaction = Transaction(user_id='Luca91', shop_id=shop)
+        transaction.shopping_cart.add(*products)
+        transaction.save()
+        return transaction.pk
+
+    def rollup(self):
+        return {(row.issuing_shop_id, row.redeeming_shop_id): (row.points_issued, row.points_redeemed)
+                for row in SettlementRollup.objects.all()}
+
+    def test_rollup_points(self):
+        """
+        Should aggregate points by issuing and
+        redeeming shop, with program coefficients
+        unless products have their own
+        """
+        self.settle('La buona pizza', self.pizza)
+        self.settle('Il buon caffè', self.coffee, self.prize)
+        settlement_rollup.run()
+        self.assertEqual(self.rollup(), {
+            ('La buona pizza', 'La buona pizza'): (4.0, 0.0),
+            ('Il buon caffè', 'Il buon caffè'): (2.0, 0.0),
+            ('La buona pizza', 'Il buon caffè'): (0.0, 20.0),
+        })
+
+    def test_rollup_points_as_settled(self):
+        """
+        Should keep the points and issuing shop of
+        transactions settled before products changed
+        """
+        self.settle('La buona pizza', self.pizza)
+        Product.objects.filter(pk=self.pizza.pk).update(value=100.0, points_coefficient=1.0, shop_id='Il buon caffè')
+        FidelityProgram.objects.filter(pk=self.program.pk).update(points_coefficient=1.0)
+        settlement_rollup.run()
+        self.assertEqual(self.rollup(), {('La buona pizza', 'La buona pizza'): (4.0, 0.0)})
+
+    def test_backfill_settled_products(self):
+        """
+        Should record the settled products of
+        transactions stored without
+        """
+        self.settle('Il buon caffè', self.coffee, self.prize)
+        SettledProduct.objects.all().delete()
+        output = StringIO()
+        call_command('rollup_settlements', backfill=True, stdout=output)
+        self.assertIn('of 1 transactions', output.getvalue())
+        self.assertEqual(self.rollup(), {
+            ('Il buon caffè', 'Il buon caffè'): (2.0, 0.0),
+            ('La buona pizza', 'Il buon caffè'): (0.0, 20.0),
+        })
+
+    def test_rollup_incrementally(self):
+        """
+        Should only aggregate the transactions
+        stored past the high-water mark
+        """
+        first = self.settle('La buona pizza', self.pizza)
+        settlement_rollup.run(batch_size=1)
+        self.settle('La buona pizza', self.pizza)
+        last = self.settle('Il buon caffè', self.coffee)
+        self.assertEqual(settlement_rollup.run(batch_size=1), (first, last))
+        self.assertEqual(settlement_rollup.run(batch_size=1), (last, last))
+        self.assertEqual(self.rollup(), {
+            ('La buona pizza', 'La buona pizza'): (8.0, 0.0),
+            ('Il buon caffè', 'Il buon caffè'): (2.0, 0.0),
+        })
+        settlement_rollup.rebuild()
+        self.assertEqual(self.rollup()[('La buona pizza', 'La buona pizza')], (8.0, 0.0))
+
+    def test_settlement_report(self):
+        """
+        Should report the month of a coalition program
+        along with the balance of each shop
+        """
+        self.settle('Il buon caffè', self.prize)
+        today = timezone.now().date()
+        call_command('rollup_settlements', stdout=StringIO())
+        self.assertEqual(settlement_report(self.program, today.replace(day=1), today), [{
+            'issuing_shop_id': 'La buona pizza',
+            'redeeming_shop_id': 'Il buon caffè',
+            'points_issued': 0.0,
+            'points_redeemed': 20.0,
+        }])
+        output = StringIO()
+        call_command('settlement_report', 'Coalizione', month=today.strftime('%Y-%m'), stdout=output)
+        self.assertRegex(output.getvalue(), r'Il buon caffè\s+20\.00\n')
+        self.assertRegex(output.getvalue(), r'La buona pizza\s+-20\.00\n')
+
+
+class ShopDailySalesAPITestCase(APITestCase):
+    """
+    Test the daily sales of shops, recorded
+    on settlement and backfilled from history
+    """
+    def setUp(self):
+        User.objects.create(username='Marco91', password='marcorossi#91', location='Camerino')
+        User.objects.create(username='Luca91', password='lucarossi#91', location='Camerino')
+        Shop.objects.create(name='La buona pizza', email='buona.pizza@gmail.com', phone='+393271234567',
+                            location='Camerino', owner_id='Marco91')
+        self.pizza = Product.objects.create(name='Pizza margherita', value=8.0, shop_id='La buona pizza')
+        self.pasta = Product.objects.create(name='Pasta al ragù', value=12.0, shop_id='La buona pizza')
+        self.today = timezone.localdate()
+
+    def settle(self, *products):
+        response = self.client.post('/transactions/', {
+            'user': 'http://testserver/users/Luca91/',
+            'shop': 'http://testserver/shops/La%20buona%20pizza/',
+            'shopping_cart': [f'http://testserver/product/{product.id}/' for product in products],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()['id']
+
+    def test_api_sales_recorded_on_settlement(self):
+        """
+        Should report the sales of the day as
+        transactions are settled
+        """
+        self.settle(self.pizza)
+        self.settle(self.pizza, self.pasta)
+        response = self.client.get('/shops/La buona pizza/sales/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['days'], [{
+            'day': self.today.isoformat(),
+            'revenue': 28.0,
+            'transactions': 2,
+            'average_basket': 14.0,
+        }])
+        self.assertEqual(response.json()['average_basket'], 14.0)
+
+    def test_api_sales_range(self):
+        """
+        Should refuse invalid dates and
+        ranges, and unknown shops
+        """
+        response = self.client.get('/shops/La buona pizza/sales/', {'start': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/shops/La buona pizza/sales/', {'start': '2024-02-01', 'end': '2024-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/shops/Il buon caffè/sales/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_backfill_daily_sales(self):
+        """
+        Should recompute the sales of past days,
+        leaving the open one to settlement
+        """
+        old = self.settle(self.pizza)
+        self.settle(self.pasta)
+        Transaction.objects.filter(pk=old).update(executed_at=timezone.now() - timedelta(days=3))
+        # Drifted as settled transactions were moved to another day, which settlement does not record
+        ShopDailySales.objects.update(revenue=0.0)
+        for run in range(2):
+            call_command('backfill_daily_sales', processes=1, chunk_days=2, stdout=StringIO())
+        self.assertEqual(
+            list(ShopDailySales.objects.order_by('day').values_list('day', 'revenue', 'transactions')),
+            [(self.today - timedelta(days=3), 8.0, 1), (self.today, 0.0, 2)]
+        )
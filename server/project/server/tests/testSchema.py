@@ -0,0 +1,39 @@
+import tempfile
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from server.schema import code_version, load_schema, schema_artifact_path
+
+
+class SchemaAPITestCase(APITestCase):
+    """
+    Test the OpenAPI schema served from
+    the artifact of the code version
+    """
+    def setUp(self):
+        self.artifacts = tempfile.TemporaryDirectory()
+        self.settings = override_settings(SCHEMA_ARTIFACT_DIR=self.artifacts.name)
+        self.settings.enable()
+        load_schema.cache_clear()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.artifacts.cleanup()
+        load_schema.cache_clear()
+
+    def test_api_schema_artifact(self):
+        """
+        Should generate the schema artifact once,
+        then serve it with an ETag to revalidate
+        """
+        response = self.client.get('/api/schema/', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(schema_artifact_path(code_version()).exists())
+        self.assertIn('/shops/', response.json()['paths'])
+        self.assertIn('max-age', response['Cache-Control'])
+        response = self.client.get('/api/schema/', HTTP_ACCEPT='application/vnd.oai.openapi+json',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get('/api/schema/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('application/vnd.oai.openapi'))
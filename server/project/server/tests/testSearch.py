@@ -0,0 +1,98 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+from server.models import User, Shop, FidelityProgram, Product
+from server.search import search, rebuild_search_index
+
+
+class SearchTestCase(APITestCase):
+    def setUp(self):
+        self.shop_admin = User.objects.get_or_create(
+            username="Marco91",
+            password="marcorossi#91",
+            bio="I own a shop!",
+            location="Camerino"
+        )
+        self.shop, shop_success = Shop.objects.get_or_create(
+            name='La buona pizza',
+            email='buona.pizza@gmail.com',
+            phone='+393271234567',
+            location='Camerino',
+            owner_id="Marco91"
+        )
+        self.another_shop, shop_success = Shop.objects.get_or_create(
+            name='Mondotea',
+            email='mondotea@gmail.com',
+            phone='+393271234567',
+            location='Macerata',
+            owner_id="Marco91"
+        )
+        self.fidelity_program = FidelityProgram(
+            name='Programma fedeltà',
+            program_type=FidelityProgram.GENERIC,
+            description='Sconti sulle pizze del weekend',
+        )
+        self.fidelity_program.save()
+        self.fidelity_program.shop_list.add('La buona pizza')
+        self.product, product_success = Product.objects.get_or_create(
+            name='Pizza margherita',
+            value=5.0,
+            shop_id='La buona pizza',
+        )
+        self.another_product, product_success = Product.objects.get_or_create(
+            name='Tè verde',
+            value=3.0,
+            shop_id='Mondotea',
+        )
+
+    def test_search_by_prefix(self):
+        """ Should match every word of the query as a prefix """
+        self.assertEqual([hit[:2] for hit in search('margh')], [('product', str(self.product.id))])
+        self.assertEqual([hit[:2] for hit in search('Macer')], [('shop', 'Mondotea')])
+        self.assertEqual(search('pizza capricciosa'), [])
+
+    def test_search_ranking(self):
+        """ Should rank name matches before description matches """
+        kinds = [hit[0] for hit in search('pizz', kinds=['shop', 'fidelityprogram'])]
+        self.assertEqual(kinds, ['shop', 'fidelityprogram'])
+
+    def test_search_ignores_accents(self):
+        """ Should match terms regardless of diacritics """
+        self.assertEqual([hit[0] for hit in search('te')], ['product'])
+        self.assertEqual([hit[0] for hit in search('fedelta')], ['fidelityprogram'])
+
+    def test_index_follows_updates(self):
+        """ Should keep the index in sync on save and delete """
+        self.product.name = 'Pizza diavola'
+        self.product.save()
+        self.assertEqual(search('margherita'), [])
+        self.assertEqual(len(search('diavola')), 1)
+        self.product.delete()
+        self.assertEqual(search('diavola'), [])
+        self.another_shop.delete()
+        self.assertEqual(search('mondotea'), [])
+
+    def test_rebuild_search_index(self):
+        """ Should index again every searchable element """
+        self.assertEqual(rebuild_search_index(), 5)
+        self.assertEqual(len(search('pizza')), 2)
+
+    def test_api_search(self):
+        response = self.client.get('/search/', {'q': 'pizza marg'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(response.json()[0]['kind'], 'product')
+        self.assertEqual(response.json()[0]['result']['name'], 'Pizza margherita')
+
+    def test_api_search_by_kind(self):
+        response = self.client.get('/search/', {'q': 'pizz', 'kind': 'shop,fidelityprogram'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([hit['kind'] for hit in response.json()], ['shop', 'fidelityprogram'])
+        response = self.client.get('/search/', {'q': 'pizza', 'kind': 'user'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_api_search_limit(self):
+        response = self.client.get('/search/', {'q': 'pizz', 'limit': -1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 1)
+        response = self.client.get('/search/', {'q': 'pizz', 'limit': 'all'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
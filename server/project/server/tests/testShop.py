@@ -1,9 +1,20 @@
+import os
+import tempfile
+import time
+from unittest import mock
+from django.conf import settings
+from django.db import connections, router
 from django.test import TestCase
 from django.urls import reverse
 from django.db.utils import IntegrityError
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.throttling import AnonRateThrottle
 from rest_framework.test import APITestCase
 from server.models import User, Shop
+from server.views import ShopViewSet
+from server.routers import PIN_COOKIE, ReadReplicaRouter, replica_database
 
 
 def resource_full_url(objpath):
@@ -205,3 +216,115 @@ class ShopAPITestCase(APITestCase):
         self.assertEqual(Shop.objects.count(), 1)
         self.assertFalse(Shop.objects.filter(name='La buona pizza').exists())
         self.assertTrue(Shop.objects.filter(name='Evergreen shop').exists())
+
+    def test_api_write_pins_primary(self):
+        """
+        Should pin to the primary database the clients
+        which wrote, so that they read back their writes
+        """
+        owner_url = reverse('user-detail', kwargs={'pk': 'Marco91'})
+        shop = {
+            'name': 'La buona pizza',
+            'email': 'buona.pizza@gmail.com',
+            'phone': '+393271234567',
+            'location': 'Camerino',
+            'owner': resource_full_url(owner_url),
+        }
+        response = self.client.get('/shops/')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = self.client.post('/shops/', shop, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], settings.READ_REPLICA_PIN_SECONDS)
+        response = self.client.get('/shops/')
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_api_list_checks_viewset_policies(self):
+        """
+        Should authenticate list requests and check the
+        permissions and throttles of the viewset
+        """
+        with mock.patch.object(ShopViewSet, 'permission_classes', [IsAuthenticated]):
+            response = self.client.get('/shops/')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertIn('WWW-Authenticate', response)
+            self.client.force_authenticate(User.objects.get(username='Marco91'))
+            response = self.client.get('/shops/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.client.force_authenticate(None)
+        with mock.patch.object(ShopViewSet, 'throttle_classes', [AnonRateThrottle]), \
+                mock.patch.object(AnonRateThrottle, 'THROTTLE_RATES', {'anon': '1/min'}):
+            self.assertEqual(self.client.get('/shops/').status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get('/shops/').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_api_reads_routed_to_replica(self):
+        """
+        Should send to a distinct replica the reads of
+        list requests, unless the action opts out or
+        the client is pinned
+        """
+        routed = []
+        db_for_read = ReadReplicaRouter.db_for_read
+
+        def record_db_for_read(router, model, **hints):
+            # Queries still run on the primary, which test databases mirror
+            routed.append(db_for_read(router, model, **hints))
+            return None
+
+        # replica_database() tells test mirrors apart from a replica
+        with mock.patch('server.routers.replica_database', return_value='replica'), \
+                mock.patch.object(ReadReplicaRouter, 'db_for_read', record_db_for_read):
+            self.client.get('/shops/')
+            self.assertIn('replica', routed)
+            routed.clear()
+            self.client.get('/users/Marco91/dashboard/')
+            self.assertNotIn('replica', routed)
+            self.client.cookies[PIN_COOKIE] = '1'
+            self.client.get('/shops/')
+            self.assertNotIn('replica', routed)
+
+    def test_api_credentials_read_from_primary(self):
+        """
+        Should check credentials against the primary
+        in requests reading from the replica
+        """
+        routed = []
+        db_for_read = ReadReplicaRouter.db_for_read
+
+        def record_db_for_read(router, model, **hints):
+            routed.append((model, db_for_read(router, model, **hints)))
+            return None
+
+        token = Token.objects.create(user=User.objects.get(username='Marco91'))
+        with mock.patch('server.routers.replica_database', return_value='replica'), \
+                mock.patch.object(ReadReplicaRouter, 'db_for_read', record_db_for_read):
+            response = self.client.get('/shops/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn((Shop, 'replica'), routed)
+        self.assertIn((Token, None), routed)
+        self.assertNotIn((Token, 'replica'), routed)
+
+    def test_stale_replica_not_read(self):
+        """
+        Should only read from a replica copied
+        from the primary recently enough
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            copy = os.path.join(directory, 'replica.sqlite3')
+            replica = {**connections['replica'].settings_dict, 'NAME': copy}
+            with mock.patch.object(connections['replica'], 'settings_dict', replica):
+                self.assertIsNone(replica_database())
+                open(copy, 'w').close()
+                self.assertEqual(replica_database(), 'replica')
+                refreshed_at = time.time() - settings.READ_REPLICA_MAX_AGE - 1
+                os.utime(copy, (refreshed_at, refreshed_at))
+                self.assertIsNone(replica_database())
+
+    def test_replica_instances_written_to_primary(self):
+        """
+        Should write to the primary the instances
+        read from the replica
+        """
+        owner = User.objects.get(username='Marco91')
+        owner._state.db = 'replica'
+        self.assertEqual(router.db_for_write(User, instance=owner), 'default')
+        self.assertEqual(router.db_for_write(User), 'default')
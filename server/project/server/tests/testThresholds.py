@@ -0,0 +1,114 @@
+from unittest import mock
+from django.test import TestCase
+from server.models import User, Shop, FidelityProgram, Catalogue, Product, Transaction, OutboxEvent
+from server.thresholds import prize_thresholds
+
+
+class PrizeThresholdTestCase(TestCase):
+    def setUp(self):
+        prize_thresholds.clear()
+        self.shop_admin = User.objects.get_or_create(
+            username="Marco91",
+            password="marcorossi#91",
+            bio="I own a shop!",
+            location="Camerino"
+        )
+        self.customer = User.objects.get_or_create(
+            username="Luca91",
+            password="lucarossi#91",
+            bio="I am a customer!",
+            location="Camerino"
+        )
+        self.shop = Shop.objects.get_or_create(
+            name='La buona pizza',
+            email='buona.pizza@gmail.com',
+            phone='+393271234567',
+            location='Camerino',
+            owner_id="Marco91"
+        )
+        self.fidelity_program = FidelityProgram(
+            name='Programma punti',
+            program_type=FidelityProgram.POINTS,
+            description='Test fidelity program',
+            points_coefficient=1.0,
+            prize_coefficient=1.0
+        )
+        self.fidelity_program.save()
+        self.fidelity_program.shop_list.add('La buona pizza')
+        self.product, product_success = Product.objects.get_or_create(
+            name='Pizza margherita',
+            value=5.0,
+            shop_id='La buona pizza',
+            fidelity_program_id='Programma punti',
+        )
+        self.prizes = [
+            Product.objects.get_or_create(
+                name=f'Premio {value}',
+                value=value,
+                shop_id='La buona pizza',
+                fidelity_program_id='Programma punti',
+                is_persistent=True
+            )[0]
+            for value in (2.0, 4.0, 6.0, 12.0)
+        ]
+        self.catalogue, catalogue_success = Catalogue.objects.get_or_create(
+            customer_id='Luca91',
+            fidelity_program_id='Programma punti',
+            points=3.0
+        )
+
+    def settle(self, *products):
+        transaction = Transaction(user_id='Luca91', shop_id='La buona pizza')
+        transaction.shopping_cart.add(*products)
+        transaction.save()
+        return transaction
+
+    def test_crossed_thresholds(self):
+        """ Should find the prizes whose value lies between two balances """
+        ids = [prize.id for prize in self.prizes]
+        self.assertEqual(prize_thresholds.crossed('Programma punti', 3.0, 8.0), ids[1:3])
+        self.assertEqual(prize_thresholds.crossed('Programma punti', 0.0, 2.0), ids[:1])
+        self.assertEqual(prize_thresholds.crossed('Programma punti', 2.0, 3.0), [])
+        self.assertEqual(prize_thresholds.crossed('Programma punti', 8.0, 3.0), [])
+        with self.assertNumQueries(0):
+            prize_thresholds.crossed('Programma punti', 0.0, 20.0)
+
+    def test_thresholds_follow_prize_updates(self):
+        """ Should reload the prices of a program when one of its prizes changes """
+        prize_thresholds.crossed('Programma punti', 0.0, 1.0)
+        self.prizes[0].value = 10.0
+        self.prizes[0].save()
+        self.assertEqual(prize_thresholds.crossed('Programma punti', 0.0, 3.0), [])
+        self.prizes[1].delete()
+        self.assertEqual(prize_thresholds.crossed('Programma punti', 3.0, 10.0),
+                         [self.prizes[2].id, self.prizes[0].id])
+
+    def test_thresholds_expire(self):
+        """ Should reload the prices of a program once they expired """
+        prize_thresholds.crossed('Programma punti', 0.0, 1.0)
+        Product.objects.filter(pk=self.prizes[0].pk).update(value=10.0)
+        self.assertEqual(prize_thresholds.crossed('Programma punti', 0.0, 3.0), [self.prizes[0].id])
+        with mock.patch('server.thresholds.monotonic', return_value=10 ** 9):
+            self.assertEqual(prize_thresholds.crossed('Programma punti', 0.0, 3.0), [])
+
+    def test_thresholds_load_racing_invalidation(self):
+        """ Should not keep prices loaded while a prize was changing """
+        load = Product.objects.filter
+
+        def filter_racing_update(*args, **kwargs):
+            prize_thresholds.invalidate(fidelity_program='Programma punti')
+            return load(*args, **kwargs)
+
+        with mock.patch.object(Product.objects, 'filter', filter_racing_update):
+            prize_thresholds.crossed('Programma punti', 0.0, 1.0)
+        self.assertNotIn('Programma punti', prize_thresholds.entries)
+
+    def test_settlement_records_affordable_prizes(self):
+        """ Should store an outbox event for every prize newly affordable """
+        self.settle(self.product)
+        events = OutboxEvent.objects.order_by('product__value')
+        self.assertEqual([event.product_id for event in events], [self.prizes[1].id, self.prizes[2].id])
+        self.assertTrue(all(event.balance == 8.0 and event.customer_id == 'Luca91' for event in events))
+        self.assertTrue(all(event.dispatched_at is None for event in events))
+        self.settle(self.product)
+        self.assertEqual(OutboxEvent.objects.count(), 3)
@@ -110,4 +110,65 @@ class TransactionTestCase(TestCase):
     #    when associated user is deleted
     #    """
     #    User.objects.filter(username='Luca91').delete()
-    #    self.assertEqual(Transaction.objects.all().count(), 1)
\ No newline at end of file
+    #    self.assertEqual(Transaction.objects.all().count(), 1)
+
+    def test_api_filter_transactions(self):
+        """ Should filter transactions by shop, user and total """
+        response = self.client.get('/transactions/', {'shop': 'La buona pizza', 'user': 'Luca91', 'total_min': 8.0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+        response = self.client.get('/transactions/', {'total_max': 8.0})
+        self.assertEqual(len(response.json()['results']), 0)
+        response = self.client.get('/transactions/', {'executed_after': '2000-01-01T00:00:00Z'})
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_api_batch_transactions(self):
+        """
+        Should store a batch of transactions in order,
+        never storing twice the same reference
+        """
+        batch = [
+            {
+                'user': 'http://testserver/users/Luca91/',
+                'shop': 'http://testserver/shops/La%20buona%20pizza/',
+                'shopping_cart': [f'http://testserver/product/{self.product.id}/'],
+                'reference': '0b0f3c9e-4a43-4d8f-9a55-0d1f2a3b4c5d',
+            },
+            {
+                'user': 'http://testserver/users/Luca91/',
+                'shop': 'http://testserver/shops/La%20buona%20pizza/',
+                'shopping_cart': ['http://testserver/product/0/'],
+            },
+        ]
+        response = self.client.post('/transactions/batch/', batch, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()], [201, 400])
+        self.assertEqual(Transaction.objects.count(), 2)
+        response = self.client.post('/transactions/batch/', batch[:1], content_type='application/json')
+        self.assertEqual([result['status'] for result in response.json()], [200])
+        self.assertEqual(Transaction.objects.count(), 2)
+        response = self.client.post('/transactions/batch/', batch[0], content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_batch_failed_transaction(self):
+        """
+        Should report a transaction failing to settle
+        without storing it nor failing the batch
+        """
+        batch = [
+            {
+                'user': 'http://testserver/users/Marco91/',
+                'shop': 'http://testserver/shops/La%20buona%20pizza/',
+                'shopping_cart': [f'http://testserver/product/{self.product.id}/'],
+            },
+            {
+                'user': 'http://testserver/users/Luca91/',
+                'shop': 'http://testserver/shops/La%20buona%20pizza/',
+                'shopping_cart': [f'http://testserver/product/{self.product.id}/'],
+            },
+        ]
+        response = self.client.post('/transactions/batch/', batch, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()], [400, 201])
+        self.assertIn('non_field_errors', response.json()[0]['errors'])
+        self.assertEqual(Transaction.objects.filter(user_id='Marco91').count(), 0)
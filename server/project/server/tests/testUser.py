@@ -158,3 +158,17 @@ class UserAPITestCase(APITestCase):
         self.assertEqual(User.objects.count(), 1)
         self.assertFalse(User.objects.filter(username='Marco91').exists())
         self.assertTrue(User.objects.filter(username='Luca91').exists())
+
+    def test_api_paginate_users(self):
+        """
+        Should return pages of the requested size,
+        ordered by an indexed field
+        """
+        for username in ['Marco91', 'Luca91', 'Anna90']:
+            User.objects.get_or_create(username=username, password='password#91', location='Camerino')
+        response = self.client.get('/users/', {'page_size': 2, 'ordering': 'username'})
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual([user['username'] for user in response.json()['results']], ['Anna90', 'Luca91'])
+        response = self.client.get('/users/', {'page_size': 2, 'page': 2, 'ordering': 'username'})
+        self.assertEqual([user['username'] for user in response.json()['results']], ['Marco91'])
+        self.assertIsNone(response.json()['next'])
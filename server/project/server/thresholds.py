@@ -0,0 +1,72 @@
+from bisect import bisect_right
+from threading import Lock
+from time import monotonic
+from django.conf import settings
+from .models import Product
+
+
+class PrizeThresholdIndex:
+    """
+    In-memory index of the persistent prizes of each fidelity
+    program, kept sorted by value. It finds the prizes whose value
+    a balance change went past through bisection, so that the cost
+    of checking a settlement is O(log P) in the program prizes.
+
+    Programs are loaded lazily on first use, expire after ttl seconds
+    and are dropped whenever one of their prizes is stored or deleted
+    in this process. A load racing with an invalidation is not kept:
+    every invalidation bumps a generation that loads compare against.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = Lock()
+        self.entries = {}
+        self.program_of = {}
+        self.generation = 0
+
+    def load(self, fidelity_program):
+        with self.lock:
+            generation = self.generation
+        prizes = list(Product.objects.filter(fidelity_program_id=fidelity_program, is_persistent=True)
+                      .order_by('value', 'id').values_list('value', 'id'))
+        values = [value for value, product in prizes]
+        products = [product for value, product in prizes]
+        with self.lock:
+            if generation == self.generation:
+                self.entries[fidelity_program] = (monotonic() + self.ttl, values, products)
+                self.program_of.update((product, fidelity_program) for product in products)
+        return values, products
+
+    def invalidate(self, fidelity_program=None, product=None):
+        with self.lock:
+            self.generation += 1
+            programs = {fidelity_program, self.program_of.pop(product, None)} - {None}
+            for program in programs:
+                self.entries.pop(program, None)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.program_of.clear()
+
+    def crossed(self, fidelity_program, previous, current):
+        """
+        Returns the ids of the prizes of the given fidelity program
+        whose value lies in (previous, current], i.e. the prizes a
+        customer can newly afford after their balance went from
+        previous to current points.
+        """
+        if current <= previous:
+            return []
+        with self.lock:
+            entry = self.entries.get(fidelity_program)
+        if entry is None or entry[0] < monotonic():
+            values, products = self.load(fidelity_program)
+        else:
+            expires_at, values, products = entry
+        return products[bisect_right(values, previous):bisect_right(values, current)]
+
+
+prize_thresholds = PrizeThresholdIndex(settings.PRIZE_THRESHOLD_TTL)
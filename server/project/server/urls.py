@@ -1,8 +1,10 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularSwaggerView
 from .views import UserViewSet, ShopViewSet, FidelityProgramViewSet, CatalogueViewSet, ProductViewSet, \
-    TransactionViewSet, CustomAuthToken
+    TransactionViewSet, LogoutView, MetricsView, SearchView, CachedSchemaView, serve_media
+from .asyncviews import ShopListView, FidelityProgramListView, ProductListView, CatalogueByUserView, \
+    AllAvailablePrizesView, AvailablePrizesView, LoginView
 
 # Create a router and register viewsets with it.
 router = DefaultRouter()
@@ -15,8 +17,19 @@ router.register(r'transactions', TransactionViewSet, basename='transaction')
 
 # The API URLs are determined automatically by the router.
 urlpatterns = [
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/schema/', CachedSchemaView.as_view(), name='schema'),
     path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('api-token-auth/', CustomAuthToken.as_view()),
+    path('api-token-auth/', LoginView.as_view()),
+    path('api-token-logout/', LogoutView.as_view(), name='logout'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('media/<path:path>', serve_media, name='media'),
+    # Hot read paths served asynchronously, ahead of their viewset routes
+    path('shops/', ShopListView.as_view()),
+    path('fidelityprograms/', FidelityProgramListView.as_view()),
+    path('product/', ProductListView.as_view()),
+    re_path(r'^catalogue/byuser/(?P<customer>\w+)/$', CatalogueByUserView.as_view()),
+    re_path(r'^catalogue/available_prizes/(?P<customer>\w+)/$', AllAvailablePrizesView.as_view()),
+    re_path(r'^catalogue/available_prizes/(?P<customer>\w+)/(?P<program>(\w|\s)+)/$', AvailablePrizesView.as_view()),
     path(r'', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,43 +1,88 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.views import static
+from django.db import DatabaseError, transaction as db_transaction
 from rest_framework import viewsets, status
-from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.reverse import reverse
-from .models import User, Shop, FidelityProgram, Catalogue, Product, Transaction
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SpectacularAPIView
+from .models import User, Shop, FidelityProgram, Catalogue, Product, Transaction, preloaded_programs
 from .modelvalidators import (UserSerializer, ShopSerializer, FidelityProgramSerializer, 
                               CashbackProgramSerializer, PointsProgramSerializer, 
                               LevelsProgramSerializer, MembershipProgramSerializer, CatalogueSerializer,
                               ProductSerializer, TransactionSerializer)
+from .search import SEARCHABLE_MODELS, search
+from .filters import IndexedFilterBackend, IndexedOrderingFilter
+from .dashboard import get_dashboard
+from .authentication import token_cache, password_verifier
+from .schema import code_version, load_schema
+from .rollups import daily_sales_report
 
 
-class CustomAuthToken(ObtainAuthToken):
+class LogoutView(APIView):
+    """
+    API endpoint revoking the token the
+    request is authenticated with.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if isinstance(request.auth, Token):
+            request.auth.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-    def post(self, request, *args, **kwargs):
-        serializer = self.serializer_class(data=request.data,
-                                           context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        user = serializer.validated_data['user']
-        token, created = Token.objects.get_or_create(user_id=user.username)
-        print(reverse('user-detail', kwargs={'pk': 'Marco91'}, request=request))
+
+class MetricsView(APIView):
+    """
+    API endpoint exposing the runtime
+    metrics of this server process.
+    """
+
+    def get(self, request):
         return Response({
-            'token': token.key,
-            'url': reverse('user-detail', kwargs={'pk': user.username}, request=request),
-            'username': user.username,
-            'password': user.password,
-            'email': user.email,
-            'groups': [x for x in user.groups.all()],
-            'avatar': str(user.avatar),
-            'bio': user.bio,
-            'location': user.location,
+            'token_cache': token_cache.metrics(),
+            'password_verifier': password_verifier.metrics(),
         })
 
+
 class UserViewSet(viewsets.ModelViewSet):
     """
     API endpoint allowing users to be viewed or edited.
     """
     queryset = User.objects.all().order_by('-date_joined')
     serializer_class = UserSerializer
+    filter_backends = [IndexedFilterBackend, IndexedOrderingFilter]
+    filter_fields = {
+        'pk': 'username__in',
+    }
+    ordering_fields = ['username', 'date_joined']
+    read_replica = True
+    dashboard_transactions = 10
+    max_dashboard_transactions = 50
+
+    # Summaries are cached until the next write: building one from a
+    # lagging replica would keep stale balances in the cache.
+    @action(detail=True, methods=['get'], read_replica=False)
+    def dashboard(self, request, pk=None):
+        """
+        API endpoint summarizing everything the customer
+        dashboard shows for the given user.
+        """
+        try:
+            transactions = int(request.query_params.get('transactions', self.dashboard_transactions))
+        except ValueError:
+            return Response({'transactions': 'A valid integer is required'}, status=status.HTTP_400_BAD_REQUEST)
+        transactions = max(0, min(transactions, self.max_dashboard_transactions))
+        return Response(get_dashboard(self.get_object(), request, transactions))
 
 
 class ShopViewSet(viewsets.ModelViewSet):
@@ -46,6 +91,38 @@ class ShopViewSet(viewsets.ModelViewSet):
     """
     queryset = Shop.objects.all().order_by('name')
     serializer_class = ShopSerializer
+    filter_backends = [IndexedFilterBackend]
+    filter_fields = {
+        'pk': 'name__in',
+    }
+    read_replica = True
+    sales_days = 30
+    max_sales_days = 366
+
+    @action(detail=True, methods=['get'])
+    def sales(self, request, pk=None):
+        """
+        API endpoint reporting the daily revenue, transactions and
+        average basket of the given shop between the start and end
+        days included, by default over the last 30 days.
+        """
+        dates = {}
+        for name in ('start', 'end'):
+            value = request.query_params.get(name)
+            try:
+                dates[name] = parse_date(value) if value else None
+            except ValueError:
+                dates[name] = None
+            if value and dates[name] is None:
+                return Response({name: 'A valid date, as YYYY-MM-DD, is required'},
+                                status=status.HTTP_400_BAD_REQUEST)
+        end = dates['end'] or timezone.localdate()
+        start = dates['start'] or end - timedelta(days=self.sales_days - 1)
+        if not 0 <= (end - start).days < self.max_sales_days:
+            return Response({'non_field_errors': [f'The start should precede the end by less than '
+                                                  f'{self.max_sales_days} days']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(daily_sales_report(self.get_object(), start, end))
 
     @action(
         detail=False,
@@ -76,6 +153,11 @@ class FidelityProgramViewSet(viewsets.ModelViewSet):
     """
     queryset = FidelityProgram.objects.all().order_by('name')
     serializer_class = FidelityProgramSerializer
+    filter_backends = [IndexedFilterBackend]
+    filter_fields = {
+        'pk': 'name__in',
+    }
+    read_replica = True
 
     # def get_queryset(self):
     #    if self.action == 'pointsprograms':
@@ -254,6 +336,15 @@ class CatalogueViewSet(viewsets.ModelViewSet):
     """
     queryset = Catalogue.objects.all()
     serializer_class = CatalogueSerializer
+    filter_backends = [IndexedFilterBackend, IndexedOrderingFilter]
+    filter_fields = {
+        'pk': 'id__in',
+        'fidelity_program': 'fidelity_program',
+        'points_min': 'points__gte',
+        'points_max': 'points__lte',
+    }
+    ordering_fields = ['id', 'points']
+    ordering = ['id']
 
     @action(
         detail=False,
@@ -299,6 +390,22 @@ class CatalogueViewSet(viewsets.ModelViewSet):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
 
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path=r'available_prizes/(?P<customer>\w+)'
+    )
+    def all_available_prizes(self, request, customer, pk=None):
+        programs = FidelityProgram.objects.filter(
+            catalogue_fidelity_program__customer_id=customer).prefetch_related('shop_list')
+        with preloaded_programs(programs):
+            prizes = list(Product.redeemable_by(customer).prefetch_related('owning_users')
+                          .order_by('fidelity_program', 'value'))
+        return Response(ProductSerializer(
+            prizes,
+            many=True,
+            context={'request': request}).data)
+
     @action(
         detail=False,
         methods=['get'],
@@ -325,6 +432,17 @@ class ProductViewSet(viewsets.ModelViewSet):
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    filter_backends = [IndexedFilterBackend, IndexedOrderingFilter]
+    filter_fields = {
+        'pk': 'id__in',
+        'shop': 'shop',
+        'fidelity_program': 'fidelity_program',
+        'is_persistent': 'is_persistent',
+        'value_min': 'value__gte',
+        'value_max': 'value__lte',
+    }
+    ordering_fields = ['id', 'value']
+    ordering = ['id']
 
     @action(
         detail=False,
@@ -389,3 +507,151 @@ class TransactionViewSet(viewsets.ModelViewSet):
     """
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    filter_backends = [IndexedFilterBackend, IndexedOrderingFilter]
+    filter_fields = {
+        'pk': 'id__in',
+        'shop': 'shop',
+        'user': 'user',
+        'executed_after': 'executed_at__gte',
+        'executed_before': 'executed_at__lte',
+        'total_min': 'total__gte',
+        'total_max': 'total__lte',
+    }
+    ordering_fields = ['id', 'executed_at', 'total']
+    ordering = ['-executed_at']
+    max_batch_size = 100
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        API endpoint storing, in the given order, a batch of
+        transactions recorded by a point of sale. Transactions whose
+        reference is already stored are not stored again. Returns
+        the outcome of each transaction of the batch.
+        """
+        if not isinstance(request.data, list):
+            return Response({'non_field_errors': ['A list of transactions is required']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.max_batch_size:
+            return Response({'non_field_errors': [f'At most {self.max_batch_size} transactions are allowed']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        results = []
+        for data in request.data:
+            stored = self.get_stored_transaction(data)
+            if stored is not None:
+                results.append({'status': status.HTTP_200_OK, 'transaction': self.get_serializer(stored).data})
+                continue
+            serializer = self.get_serializer(data=data)
+            if not serializer.is_valid():
+                results.append({'status': status.HTTP_400_BAD_REQUEST, 'errors': serializer.errors})
+                continue
+            try:
+                # A savepoint of its own, so that a failed transaction leaves no trace nor fails the others
+                with db_transaction.atomic():
+                    serializer.save()
+            except (ObjectDoesNotExist, DjangoValidationError, DatabaseError) as ex:
+                results.append({'status': status.HTTP_400_BAD_REQUEST, 'errors': {'non_field_errors': [str(ex)]}})
+                continue
+            results.append({'status': status.HTTP_201_CREATED, 'transaction': serializer.data})
+        return Response(results)
+
+    @staticmethod
+    def get_stored_transaction(data):
+        reference = data.get('reference') if isinstance(data, dict) else None
+        if not reference:
+            return None
+        try:
+            return Transaction.objects.filter(reference=reference).first()
+        except DjangoValidationError:
+            return None
+
+
+
+class SearchView(APIView):
+    """
+    API endpoint allowing shops, products and fidelity
+    programs to be searched by name and description,
+    best matches first.
+    """
+    serializers = {
+        'shop': ShopSerializer,
+        'product': ProductSerializer,
+        'fidelityprogram': FidelityProgramSerializer,
+    }
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        kinds = [kind for kind in request.query_params.get('kind', '').split(',') if kind]
+        if any(kind not in SEARCHABLE_MODELS for kind in kinds):
+            return Response(
+                {'kind': f'Allowed values are {", ".join(SEARCHABLE_MODELS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response({'limit': 'A valid integer is required'}, status=status.HTTP_400_BAD_REQUEST)
+        # A negative limit would lift the one of the query altogether
+        limit = max(1, min(limit, self.max_limit))
+        hits = search(query, kinds=kinds, limit=limit)
+        keys_by_kind = {}
+        for kind, key, score in hits:
+            model = SEARCHABLE_MODELS[kind][0]
+            keys_by_kind.setdefault(kind, []).append(model._meta.pk.to_python(key))
+        objects = {
+            kind: SEARCHABLE_MODELS[kind][0].objects.in_bulk(keys)
+            for kind, keys in keys_by_kind.items()
+        }
+        results = []
+        for kind, key, score in hits:
+            model = SEARCHABLE_MODELS[kind][0]
+            instance = objects[kind].get(model._meta.pk.to_python(key))
+            if instance is not None:
+                results.append({
+                    'kind': kind,
+                    'score': score,
+                    'result': self.serializers[kind](instance, context={'request': request}).data,
+                })
+        return Response(results)
+
+
+class CachedSchemaView(SpectacularAPIView):
+    """
+    API endpoint serving the OpenAPI schema generated once for
+    the running code version, rendered once per format. Clients
+    cache it and revalidate it through its ETag.
+    """
+    rendered = {}
+
+    @extend_schema(exclude=True)
+    def get(self, request, *args, **kwargs):
+        version = code_version()
+        renderer = request.accepted_renderer
+        etag = f'"{version}:{renderer.media_type}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            key = (version, renderer.media_type)
+            if key not in self.rendered:
+                self.rendered[key] = renderer.render(load_schema(version), renderer.media_type,
+                                                     self.get_renderer_context())
+            content_type = renderer.media_type
+            if renderer.charset:
+                content_type += f'; charset={renderer.charset}'
+            response = HttpResponse(self.rendered[key], content_type=content_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = f'public, max-age={settings.SCHEMA_CACHE_MAX_AGE}'
+        return response
+
+
+def serve_media(request, path):
+    """
+    Serves an uploaded file, e.g. an avatar or one of its variants,
+    answering conditional requests with a 304. Stored files are never
+    overwritten by uploads, so clients may cache them for good.
+    """
+    response = static.serve(request, path, document_root=settings.MEDIA_ROOT)
+    if response.status_code in (200, 304):
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE, immutable=True)
+    return response